@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app.config import (
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES,
+)
+
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of answers to first-turn prompts, matched by embedding similarity.
+
+    A lookup returns the stored answer of the most similar cached prompt when its
+    cosine similarity is at least `threshold`. Entries expire after `ttl` seconds and
+    the least recently used entry is evicted past `max_entries`. The whole cache is
+    dropped when the collection version it was filled from changes.
+
+    Normalised prompt vectors live in one preallocated matrix, one row per slot,
+    so a lookup is a single matrix-vector product over every entry.
+    """
+
+    def __init__(
+        self,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        ttl=ANSWER_CACHE_TTL_SECONDS,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._matrix = None  # allocated on the first store, once the dimensions are known
+        self._created = np.zeros(self.max_entries, dtype=np.float64)
+        self._scopes = np.full(self.max_entries, -1, dtype=np.int64)
+        self._scope_ids = {}
+        self._entries = OrderedDict()  # slot -> {"prompt", "answer"}, least recently used first
+        self._free = list(range(self.max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def _release(self, slot):
+        del self._entries[slot]
+        self._scopes[slot] = -1
+        self._free.append(slot)
+
+    def lookup(self, embedding, scope):
+        """Return the cached answer for a similar prompt asked with the same `scope`, or None."""
+        query = normalize(embedding)
+        now = time.time()
+        with self._lock:
+            scope_id = self._scope_ids.get(scope)
+            if self._matrix is None or scope_id is None or len(query) != self._matrix.shape[1]:
+                self.misses += 1
+                return None
+            live = self._scopes >= 0
+            for slot in np.flatnonzero(live & (now - self._created > self.ttl)):
+                self._release(int(slot))
+            candidates = self._scopes == scope_id
+            if candidates.any():
+                scores = np.where(candidates, self._matrix @ query, -np.inf)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(best)
+                    self.hits += 1
+                    return self._entries[best]["answer"]
+            self.misses += 1
+        return None
+
+    def store(self, embedding, scope, prompt, answer):
+        vector = normalize(embedding)
+        with self._lock:
+            if self._matrix is None or len(vector) != self._matrix.shape[1]:
+                self._reset(len(vector))
+            if not self._free:
+                self._release(next(iter(self._entries)))
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._created[slot] = time.time()
+            self._scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            self._entries[slot] = {"prompt": prompt, "answer": answer}
+
+    def _reset(self, dimensions=None):
+        if dimensions is not None:
+            self._matrix = np.zeros((self.max_entries, dimensions), dtype=np.float32)
+        self._scopes[:] = -1
+        self._scope_ids.clear()
+        self._entries.clear()
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def sync_version(self, version):
+        """Drop every entry if the collection was re-ingested since the cache was filled."""
+        with self._lock:
+            if version != self.version:
+                self._reset()
+                self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
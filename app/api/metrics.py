@@ -0,0 +1,144 @@
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; spans cache hits through slow completions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; cumulative counts are only built when rendered."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Process-wide request metrics, exposed in the Prometheus text format.
+
+    Updated from the event loop thread only, so no locking. Recording is a
+    dict lookup and a bisect; all formatting happens in render().
+    """
+
+    def __init__(self):
+        self.stage_seconds = {}  # (endpoint, stage) -> Histogram
+        self.counters = {}  # (name, sorted label items) -> value
+
+    def observe_stage(self, endpoint, stage, seconds):
+        key = (endpoint, stage)
+        histogram = self.stage_seconds.get(key)
+        if histogram is None:
+            histogram = self.stage_seconds[key] = Histogram()
+        histogram.observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self, gauges=None):
+        """
+        Format everything recorded so far.
+
+        Args:
+            gauges: {name: value} sampled at scrape time (e.g. cache statistics)
+        """
+        lines = [
+            "# HELP query_stage_seconds Time spent in each stage of a query request.",
+            "# TYPE query_stage_seconds histogram",
+        ]
+        for (endpoint, stage), histogram in sorted(self.stage_seconds.items()):
+            labels = f'endpoint="{endpoint}",stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'query_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'query_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"query_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"query_stage_seconds_count{{{labels}}} {histogram.count}")
+
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class RequestTimings:
+    """Stage durations of one request, for its Server-Timing header and the histograms."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        # A stage can run more than once per request (e.g. a second search); report the total
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self):
+        """Value for the `Server-Timing` header, durations in milliseconds."""
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def as_dict(self):
+        timings = {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 1)
+        return timings
+
+    def finish(self, outcome="ok"):
+        """Fold this request into the process-wide metrics."""
+        for stage, seconds in self.stages.items():
+            metrics.observe_stage(self.endpoint, stage, seconds)
+        metrics.observe_stage(self.endpoint, "total", time.perf_counter() - self.started)
+        metrics.increment("query_requests_total", endpoint=self.endpoint, outcome=outcome)
+
+
+# Timings of the request being handled; asyncio tasks started by it inherit the same object
+_current = ContextVar("request_timings", default=None)
+
+
+def start_request(endpoint):
+    timings = RequestTimings(endpoint)
+    _current.set(timings)
+    return timings
+
+
+@contextmanager
+def timed_stage(stage):
+    """Time a block as `stage` of the current request; a no-op outside one."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - started)
+
+
+async def timed(stage, awaitable):
+    """Await `awaitable`, timing it as `stage`; for stages that run under asyncio.gather."""
+    with timed_stage(stage):
+        return await awaitable
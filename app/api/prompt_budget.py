@@ -0,0 +1,62 @@
+from app.pdf.tokens import count_tokens_with, encoding_name_for_model
+from app.config import CHAT_MODEL, PROMPT_MAX_TOKENS, ANSWER_MAX_TOKENS, CONTEXT_MAX_TOKENS
+
+# Rough per-message framing overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+CHAT_ENCODING = encoding_name_for_model(CHAT_MODEL)
+
+
+def count_chat_tokens(text):
+    """Tokens of `text` in the chat model's encoding; use this for every part of the prompt."""
+    return count_tokens_with(CHAT_ENCODING, text)
+
+
+def pack_context(
+    hits,
+    fixed_tokens,
+    max_tokens=PROMPT_MAX_TOKENS,
+    answer_tokens=ANSWER_MAX_TOKENS,
+    context_cap=CONTEXT_MAX_TOKENS,
+    separator="\n",
+):
+    """
+    Fill the context with retrieved chunks, best first, within a token budget.
+
+    The budget is what remains of `max_tokens` after the fixed parts of the prompt
+    (instructions, history, question) and the reserved answer, capped at
+    `context_cap`. A chunk that doesn't fit is skipped so a smaller, lower-ranked
+    one can still use the remaining room.
+
+    Args:
+        hits: Retrieved points (with .payload["text"]), in rank order
+        fixed_tokens: Tokens already used by everything except the context
+
+    Returns:
+        (context, stats) where stats records the token accounting for the request
+    """
+    budget = max(0, min(context_cap, max_tokens - answer_tokens - fixed_tokens))
+    separator_tokens = count_chat_tokens(separator)
+    used = 0
+    chunks = []
+    dropped = 0
+    for hit in hits:
+        text = (hit.payload or {}).get("text")
+        if not text:
+            continue
+        tokens = count_chat_tokens(text) + (separator_tokens if chunks else 0)
+        if used + tokens > budget:
+            dropped += 1
+            continue
+        chunks.append(text)
+        used += tokens
+    stats = {
+        "context": used,
+        "contextBudget": budget,
+        "chunksUsed": len(chunks),
+        "chunksDropped": dropped,
+        "fixed": fixed_tokens,
+        "answerReserved": answer_tokens,
+        "promptTotal": fixed_tokens + used,
+    }
+    return separator.join(chunks), stats
@@ -1,107 +1,98 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response, Query, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from app.pdf.embedder import get_embedding
-from app.pdf.uploader import client  # QdrantClient instance
-from app.config import QDRANT_COLLECTION, OPENAI_API_KEY
-from openai import OpenAI
-from app.db.fetchers import write_chat_record
+from app.pdf.embedder import get_embedding_async, cache as embedding_cache
+from app.pdf.uploader import async_client as qdrant_client  # AsyncQdrantClient instance
+from app.config import (
+    QDRANT_COLLECTION,
+    OPENAI_API_KEY,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_VERSION_CHECK_SECONDS,
+    HISTORY_MAX_TURNS,
+    HISTORY_MAX_TOKENS,
+    HISTORY_SUMMARY_ENABLED,
+    HISTORY_SUMMARY_MODEL,
+    HYBRID_SEARCH_ENABLED,
+    RETRIEVAL_CANDIDATES,
+    MMR_ENABLED,
+    MMR_LAMBDA,
+    DUPLICATE_SIMILARITY,
+    CHAT_MODEL,
+    ANSWER_MAX_TOKENS,
+)
+from app.api.prompt_budget import pack_context, count_chat_tokens
+from app.api.prompts import build_messages, prompt_fixed_tokens
+from app.api.retrieval import (
+    reciprocal_rank_fusion,
+    lexical_hits_to_chunks,
+    collapse_adjacent_chunks,
+    mmr_select,
+)
+from app.db.lexical_index import search_lexical
+from openai import AsyncOpenAI
+from app.db.fetchers import write_chat_record_async, get_collection_version_async, backfill_chat_sessions_async
+from app.api.answer_cache import SemanticAnswerCache
+from app.api.metrics import metrics, start_request, timed_stage, timed
+import asyncio
+import base64
+import json
+import time
 import uuid
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from datetime import datetime
-from app.db.mongo import db
-
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
-def ask_openai_with_context(prompt, context, chat_history=""):
-    system_prompt = (
-        "You are a helpful, accurate, and professional conversational assistant for Five Iron Golf staff.\n"
-        "You MUST follow a strict process to answer questions based on the most reliable available information.\n\n"
-        
-        "=== 📌 CONTEXT-AWARE ANSWERING (STRICT) ===\n"
-        "1. Your first priority is to answer the question using ONLY the provided context below.\n"
-        "2. If the user asks about specific **scheduled audits, events, or checklists**, look for exact matches in the context.\n"
-        "3. If not found, explain clearly what information **is available**, such as:\n"
-        "   • Types of audits\n"
-        "   • Setup processes\n"
-        "   • Available forms or templates\n"
-        "4. NEVER hallucinate, guess, or invent information not present in the context.\n"
-        "5. If a direct match isn't found, explain what similar or related information IS available in the context.\n"
-        # "6. If no related information exists in the context at all, simply state: 'I don't see information about [topic] in the bussiness. Would you like me to search for information on a related topic instead?'\n\n"
-        
-        "=== 🔍 KNOWLEDGE GRAPH NAVIGATION & CONVERSATION CONTINUITY ===\n"
-        "1. Connect relevant nodes from the knowledge base when answering questions.\n"
-        "2. If the initial context doesn't contain a complete answer, mention other related information available.\n"
-        "3. Example: 'I don't see specifics about X, but our knowledge base contains related information about Y and Z. Would you like me to share that instead?'\n"
-        "4. Only suggest information that actually appears in the context or base nodes provided to you.\n"
-        "5. ALWAYS acknowledge previous exchanges in the conversation. If the user's question follows up on a previous topic, acknowledge this connection.\n"
-        "6. If the user's question changes topic entirely from previous exchanges, acknowledge the topic shift.\n"
-        "7. Example of acknowledging: 'Regarding your question about fire safety hazards, I don't see specific information about that in our knowledge base. However, I notice you're now asking about...' or 'To follow up on our discussion about X, the information about Y is...'\n"
-        "8. If the user responds with an affirmative answer (yes, yeah, sure, okay, absolutely, please do, go ahead, etc.) to your offer to search for related topics, you MUST:\n"
-        "   • Acknowledge their response (e.g., 'Great! Based on your interest in [original topic]...')\n"
-        "   • Extract the most relevant categories or topics from the knowledge base context\n"
-        "   • Present these as clear options for the user to explore further\n"
-        "   • Example: 'Great! Based on your interest in fire safety, here are related categories I found in our knowledge base: 1) Safety Protocols, 2) Emergency Procedures, 3) Facility Maintenance. Which of these would you like to explore?'\n"
-        "   • Continue this process, prompting the user with relevant categories, until the user selects a topic that leads to information actually present in the knowledge base or graph.\n"
-        "   • Do not provide general or global information unless the user explicitly asks for it. If the user requests general info, reconfirm politely and explain why specific info could not be found in the relevant graph node cluster.\n\n"
-
-        "=== 🔗 MARKDOWN FORMATTING REQUIREMENTS ===\n"
-        "1. Always generate responses in valid markdown format. This is essential for frontend rendering. Do not use the input prompt as heading in responses and generate human-like conversational responses.\n"
-        "2. Include links using markdown syntax where applicable.\n"
-        "3. Use these markdown formatting conventions consistently:\n"
-        "   • Use `#`, `##`, `###` for headings and subheadings\n"
-        "   • Use `*` or `-` for bullet points and lists\n"
-        "   • Use `**text**` for bold/important terms\n"
-        "   • Use `*text*` for italic/emphasis\n"
-        "   • Use `> text` for quotes or highlighted information\n"
-        "   • Use proper line breaks between paragraphs (double line break)\n"
-        "   • Use code blocks with backticks when showing examples or steps\n\n"
-        
-        "=== ⚠️ HANDLING MISSING INFORMATION ===\n"
-        # "1. When information isn't available, be direct but helpful: 'I don't see that information in our knowledge base.'\n"
-        "2. Then offer: 'Would you like me to share what is available on related topics?'\n"
-        "3. If the user responds affirmatively (yes, yeah, sure, etc.), DO NOT provide generic information. Instead, extract relevant categories or topics from the context and present them as options, and continue this process until the user reaches information that is actually present in the knowledge base.\n"
-        "4. If the user requests information beyond the knowledge base, politely confirm: 'The specific information isn't in our knowledge base. Are you looking for general information on this topic? I should note that I can only provide verified information from our internal resources.'\n"
-        "5. NEVER provide generic information when the answer isn't in the context. Instead, suggest searching for related topics that ARE in the context.\n\n"
-        
-        "=== 🔗 REFERENCING & FORMATTING RULES ===\n"
-        "1. Include links using angle brackets where applicable.\n"
-        "   • e.g., 'You can find the checklist here <Morning Audit Checklist>'\n"
-        "2. ALWAYS include relevant links/references using angle brackets at the end of sentences where appropriate (e.g., 'You can find the morning checklist here <Morning Audit Checklist>').\n"
-        "3. Always format the response as **rich text** that can be rendered on the frontend:\n"
-        "   • Use bullet points for structured lists\n"
-        "   • Use **bold** for key terms\n"
-        "   • Use *italics* for emphasis\n"
-        "   • Use line breaks between sections\n"
-        "   • Insert any links using angle brackets: <Link Name>\n\n"
-        
-        "=== 💬 TONE & STYLE ===\n"
-        "1. Be friendly, helpful, and clear.\n"
-        "2. If the answer isn't directly available, explain the gap but still offer what *is* known.\n"
-        "3. NEVER guess or hallucinate information.\n"
-        "4. If asked about specific scheduled audits or events, check if the context contains that specific information. If not, explain what information is available about audits (like audit types, setup process, or forms).\n"
-        "5. If the context contains only forms/templates but not scheduled events, explain this distinction to the user.\n"
-        "6. When the exact information isn't available, offer alternative helpful information from the context, such as: 'While I don't see a list of scheduled audits, I can tell you about the audit forms available and how to set up audits.'\n"
-        "7. If relevant, explain how the user might find the specific information they're looking for based on the process information in the context.\n"
-        "8. Keep your answers conversational, helpful and reference the context appropriately.\n\n"
-
-        f"Context:\n{context}\n\n"
-        f"Conversation so far:\n{chat_history}\n\n"
-        f"User Question:\n{prompt}\n\n"
-        f"Answer (Rich Text Response):"
-    )
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-        ],
-        max_tokens=1024,
+from app.db.mongo import async_db
+from bson import ObjectId
+from qdrant_client.models import Filter, FieldCondition, MatchAny, MatchValue
+
+openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+answer_cache = SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
+_last_version_check = 0.0
+
+def record_usage(usage):
+    """Count the tokens OpenAI reports for a completion."""
+    if usage is None:
+        return
+    metrics.increment("openai_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+    metrics.increment("openai_tokens_total", getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+
+
+async def ask_openai_with_context(prompt, context, chat_history=""):
+    response = await openai_client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=build_messages(prompt, context, chat_history),
+        max_tokens=ANSWER_MAX_TOKENS,
         temperature=0.2,
     )
+    record_usage(getattr(response, "usage", None))
     return response.choices[0].message.content.strip()
 
 
-app = FastAPI()
+async def stream_openai_with_context(prompt, context, chat_history=""):
+    """Yield answer tokens from gpt-4o as they are generated."""
+    stream = await openai_client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=build_messages(prompt, context, chat_history),
+        max_tokens=ANSWER_MAX_TOKENS,
+        temperature=0.2,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+        # With include_usage the last chunk has no choices, only the token counts
+        record_usage(getattr(chunk, "usage", None))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await ensure_indexes()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow all origins
 app.add_middleware(
@@ -117,6 +108,9 @@ class QueryRequest(BaseModel):
     top_k: int = 3
     sessionId: Optional[str] = None
     userId: Optional[str] = None
+    # Restrict retrieval to these module types ("sop", "form", "audit", ...) and/or one entity
+    moduleTypes: Optional[List[str]] = None
+    entityId: Optional[str] = None
 
 def get_dynamic_id(payload):
     """Get the appropriate ID field based on module type"""
@@ -125,45 +119,335 @@ def get_dynamic_id(payload):
     return payload.get(id_field)
 
 
-def build_chat_history(session_id: str) -> str:
-    chats = list(
-        db["chatHistorys"].find({"sessionId": session_id}).sort("createdAt", 1)
+HISTORY_PROJECTION = {"query": 1, "response": 1, "createdAt": 1, "_id": 0}
+
+
+async def ensure_indexes():
+    # Serves "latest N turns of a session" without a collection scan or in-memory sort
+    await async_db["chatHistorys"].create_index([("sessionId", 1), ("createdAt", -1), ("_id", -1)])
+    # Session listing: newest activity first, optionally per user
+    await async_db["chatSessions"].create_index([("lastAt", -1), ("_id", -1)])
+    await async_db["chatSessions"].create_index([("userId", 1), ("lastAt", -1), ("_id", -1)])
+    # Sessions from before chatSessions existed; runs once per database, off the startup
+    # path, in whichever worker claims it first
+    task = asyncio.create_task(backfill_sessions())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def backfill_sessions():
+    try:
+        if await backfill_chat_sessions_async():
+            print("🗂️ Backfilled chatSessions from chatHistorys.")
+    except Exception as e:
+        print(f"❌ chatSessions backfill failed: {e}")
+
+
+def format_turn(chat) -> str:
+    lines = []
+    user_msg = (chat.get("query") or "").strip()
+    ai_msg = (chat.get("response") or "").strip()
+    if user_msg:
+        lines.append(f"User: {user_msg}")
+    if ai_msg:
+        lines.append(f"Assistant: {ai_msg}")
+    return "\n".join(lines)
+
+
+async def fetch_session_summary(session_id: str) -> str:
+    if not HISTORY_SUMMARY_ENABLED:
+        return ""
+    session = await async_db["chatSessions"].find_one({"_id": session_id}, {"summary": 1})
+    return (session or {}).get("summary", "")
+
+
+async def build_chat_history(
+    session_id: str, max_turns: int = HISTORY_MAX_TURNS, max_tokens: int = HISTORY_MAX_TOKENS
+) -> str:
+    """
+    Build the conversation so far from the most recent turns of a session.
+
+    Only the last `max_turns` turns are read, and the oldest of those are dropped
+    until the history fits in `max_tokens`. When summaries are enabled, the rolling
+    summary of earlier turns is placed first.
+    """
+    cursor = (
+        async_db["chatHistorys"]
+        .find({"sessionId": session_id}, HISTORY_PROJECTION)
+        .sort("createdAt", -1)
+        .limit(max_turns)
     )
-    history = ""
-    for c in chats:
-        user_msg = c.get("query", "").strip()
-        ai_msg = c.get("response", "").strip()
-        if user_msg:
-            history += f"User: {user_msg}\n"
-        if ai_msg:
-            history += f"Assistant: {ai_msg}\n"
-    return history.strip()
+    chats, summary = await asyncio.gather(cursor.to_list(max_turns), fetch_session_summary(session_id))
+
+    budget = max_tokens
+    parts = []
+    if summary:
+        summary_text = f"Summary of earlier conversation: {summary}"
+        budget -= count_chat_tokens(summary_text)
+    # Newest first, so the most recent turns win when the budget runs out
+    for chat in chats:
+        turn = format_turn(chat)
+        if not turn:
+            continue
+        tokens = count_chat_tokens(turn)
+        if tokens > budget:
+            break
+        budget -= tokens
+        parts.append(turn)
+    parts.reverse()
+    if summary:
+        parts.insert(0, summary_text)
+    return "\n".join(parts)
+
+
+async def update_session_summary(session_id: str, keep_turns: int = HISTORY_MAX_TURNS):
+    """Fold turns that have fallen out of the recent window into the session's rolling summary."""
+    sessions = async_db["chatSessions"]
+    session = await sessions.find_one({"_id": session_id}) or {}
+    query = {"sessionId": session_id}
+    if session.get("summarizedUntil"):
+        query["createdAt"] = {"$gt": session["summarizedUntil"]}
+    older = await (
+        async_db["chatHistorys"]
+        .find(query, HISTORY_PROJECTION)
+        .sort("createdAt", -1)
+        .skip(keep_turns)
+        .to_list(None)
+    )
+    if not older:
+        return
+    older.reverse()
+    transcript = "\n".join(format_turn(chat) for chat in older)
+    response = await openai_client.chat.completions.create(
+        model=HISTORY_SUMMARY_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "Update the running summary of a support conversation. Keep the topics the user "
+                    "asked about, answers given and open follow-ups. Reply with the summary only, "
+                    "in at most 150 words."
+                ),
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{session.get('summary', '')}\n\nNew turns:\n{transcript}",
+            },
+        ],
+        max_tokens=300,
+        temperature=0,
+    )
+    await sessions.update_one(
+        {"_id": session_id},
+        {
+            "$set": {
+                "summary": response.choices[0].message.content.strip(),
+                "summarizedUntil": older[-1]["createdAt"],
+                "updatedAt": datetime.utcnow(),
+            }
+        },
+        upsert=True,
+    )
+
+
+_background_tasks = set()
+
+
+def schedule_summary_update(session_id: str):
+    """Refresh the summary after the response is stored, off the request's critical path."""
+    if HISTORY_SUMMARY_ENABLED:
+        task = asyncio.create_task(update_session_summary(session_id))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+async def refresh_answer_cache():
+    """Drop cached answers if the collection was re-ingested; checked at most every few seconds."""
+    global _last_version_check
+    now = time.monotonic()
+    if now - _last_version_check < ANSWER_CACHE_VERSION_CHECK_SECONDS:
+        return
+    _last_version_check = now
+    answer_cache.sync_version(await get_collection_version_async(QDRANT_COLLECTION))
+
+
+def build_search_filter(request: QueryRequest):
+    """
+    Translate the request's scope into vector-store and keyword-index filters.
+
+    Returns:
+        (qdrant Filter or None, Mongo filter dict or None)
+    """
+    conditions = []
+    lexical = {}
+    if request.moduleTypes:
+        conditions.append(FieldCondition(key="module_type", match=MatchAny(any=request.moduleTypes)))
+        lexical["module_type"] = {"$in": request.moduleTypes}
+    if request.entityId:
+        conditions.append(FieldCondition(key="entityId", match=MatchValue(value=request.entityId)))
+        lexical["entityId"] = request.entityId
+    if not conditions:
+        return None, None
+    return Filter(must=conditions), lexical
+
+
+def cache_scope(request: QueryRequest):
+    """Cached answers are only reused for requests with the same retrieval settings."""
+    return (request.top_k, tuple(sorted(request.moduleTypes or [])), request.entityId)
+
+
+async def search_lexical_safe(prompt: str, limit: int, filters=None):
+    """Keyword search; degrades to no results so vector retrieval still answers."""
+    try:
+        return lexical_hits_to_chunks(
+            await search_lexical(QDRANT_COLLECTION, prompt, limit=limit, filters=filters)
+        )
+    except Exception as e:
+        print(f"⚠️ Lexical search failed: {e}")
+        return []
+
+
+async def attach_missing_vectors(hits):
+    """Fetch vectors for hits that came only from the keyword index."""
+    missing = [hit for hit in hits if getattr(hit, "vector", None) is None]
+    if not missing:
+        return
+    records = await qdrant_client.retrieve(
+        collection_name=QDRANT_COLLECTION,
+        ids=[hit.id for hit in missing],
+        with_payload=False,
+        with_vectors=True,
+    )
+    vectors = {str(record.id): record.vector for record in records}
+    for hit in missing:
+        hit.vector = vectors.get(str(hit.id))
+
+
+async def vector_search_points(query_embedding, query_filter, limit):
+    """Nearest chunks to the query embedding, with their vectors when MMR needs them."""
+    response = await qdrant_client.query_points(
+        collection_name=QDRANT_COLLECTION,
+        query=query_embedding,
+        query_filter=query_filter,
+        limit=limit,
+        with_payload=True,
+        with_vectors=MMR_ENABLED,
+    )
+    return response.points
+
+
+async def search_chunks(request: QueryRequest, query_embedding):
+    """
+    Retrieve the chunks used as context for a request.
+
+    Over-fetches candidates from vector search (fused with keyword search by
+    reciprocal rank when hybrid search is on), collapses overlapping neighbours
+    of the same document and picks top_k by maximal marginal relevance.
+    """
+    vector_filter, lexical_filter = build_search_filter(request)
+    rerank = HYBRID_SEARCH_ENABLED or MMR_ENABLED
+    candidates = max(request.top_k, RETRIEVAL_CANDIDATES) if rerank else request.top_k
+    vector_search = timed("vector_search", vector_search_points(query_embedding, vector_filter, candidates))
+    if HYBRID_SEARCH_ENABLED:
+        vector_hits, lexical_hits = await asyncio.gather(
+            vector_search,
+            timed("lexical_search", search_lexical_safe(request.prompt, candidates, lexical_filter)),
+        )
+        with timed_stage("rerank"):
+            hits = reciprocal_rank_fusion([vector_hits, lexical_hits], limit=candidates)
+    else:
+        hits = await vector_search
+
+    if not MMR_ENABLED:
+        return hits[:request.top_k]
+    with timed_stage("rerank"):
+        try:
+            await attach_missing_vectors(hits)
+        except Exception as e:
+            print(f"⚠️ Could not fetch vectors for keyword hits: {e}")
+        hits = collapse_adjacent_chunks(hits)
+        return mmr_select(hits, request.top_k, lambda_=MMR_LAMBDA, duplicate_similarity=DUPLICATE_SIMILARITY)
+
+
+async def retrieve_context(request: QueryRequest):
+    """
+    Embed the prompt, then either answer it from the semantic cache or search Qdrant.
+
+    Returns:
+        (query_embedding, cached_answer, results); results is empty on a cache hit
+    """
+    with timed_stage("embed"):
+        query_embedding = await get_embedding_async(request.prompt)
+    if answer_cache is not None:
+        with timed_stage("answer_cache"):
+            await refresh_answer_cache()
+            cached_answer = answer_cache.lookup(query_embedding, cache_scope(request))
+        if cached_answer is not None:
+            return query_embedding, cached_answer, []
+    results = await search_chunks(request, query_embedding)
+    return query_embedding, None, results
+
+
+async def prepare_answer(request: QueryRequest, session_id: str):
+    """
+    Run retrieval and the chat history read concurrently.
+
+    Returns:
+        (query_embedding, cached_answer, context, chat_history, token_counts). The
+        cached answer is only used for the first turn of a session.
+    """
+    (query_embedding, cached_answer, results), chat_history = await asyncio.gather(
+        retrieve_context(request),
+        timed("history", build_chat_history(session_id)),
+    )
+    if cached_answer is not None and chat_history:
+        cached_answer = None
+        results = await search_chunks(request, query_embedding)
+    with timed_stage("pack"):
+        context, token_counts = pack_context(results, prompt_fixed_tokens(request.prompt, chat_history))
+    return query_embedding, cached_answer, context, chat_history, token_counts
+
+
+def remember_answer(query_embedding, request: QueryRequest, chat_history, response_text):
+    """Cache a freshly generated first-turn answer."""
+    if answer_cache is not None and not chat_history and response_text:
+        answer_cache.store(query_embedding, cache_scope(request), request.prompt, response_text)
 
 
 @app.post("/query")
-def query_vector_db(request: QueryRequest):
+async def query_vector_db(request: QueryRequest, response: Response):
+    timings = start_request("query")
+    try:
+        result, cached = await answer_query(request)
+    except Exception:
+        timings.finish("error")
+        raise
+    response.headers["Server-Timing"] = timings.server_timing()
+    timings.finish("cached" if cached else "ok")
+    return result
+
+
+async def answer_query(request: QueryRequest):
+    """
+    Answer one /query request.
+
+    Returns:
+        (response body, whether the answer came from the answer cache)
+    """
     # 1. Handle sessionId
     session_id = request.sessionId if request.sessionId else str(uuid.uuid4())
 
     userId = request.userId if request.userId else "anonymous"
 
-    # 2. Embed the prompt
-    query_embedding = get_embedding(request.prompt)
-    # 3. Search Qdrant
-    results = client.search(
-        collection_name=QDRANT_COLLECTION,
-        query_vector=query_embedding,
-        limit=request.top_k,
-    )
-    # 4. Extract context
-    context_chunks = [
-        hit.payload.get("text") for hit in results if hit.payload.get("text")
-    ]
-    context = "\n".join(context_chunks)
+    # 2-4. Embed + search Qdrant (or hit the answer cache), and 🧠 build chat history concurrently
+    query_embedding, cached_answer, context, chat_history, token_counts = await prepare_answer(request, session_id)
 
-    # 🧠 Build chat history
-    chat_history = build_chat_history(session_id)
-    response_text = ask_openai_with_context(request.prompt, context, chat_history)
+    if cached_answer is not None:
+        response_text = cached_answer
+    else:
+        with timed_stage("llm"):
+            response_text = await ask_openai_with_context(request.prompt, context, chat_history)
+        remember_answer(query_embedding, request, chat_history, response_text)
 
     # 5. Store chat in MongoDB
     chat_payload = {
@@ -173,35 +457,224 @@ def query_vector_db(request: QueryRequest):
         "createdAt": datetime.utcnow(),
         "updatedAt": datetime.utcnow(),
         "userId": userId,
+        "tokenCounts": token_counts,
     }
-    write_chat_record(chat_payload)
+    with timed_stage("store"):
+        await write_chat_record_async(chat_payload)
+    schedule_summary_update(session_id)
 
     # 6. Return response with sessionId
-    return {"sessionId": session_id, "results": response_text, "contentType": 'markdown'}
+    return {"sessionId": session_id, "results": response_text, "contentType": 'markdown'}, cached_answer is not None
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/query/stream")
+async def query_vector_db_stream(request: QueryRequest):
+    """
+    Streaming variant of /query.
+
+    Emits a `session` event carrying the sessionId, one `token` event per
+    generated fragment and a final `done` event with the stage timings in
+    milliseconds, or an `error` event if any step fails. The chat record is
+    stored once the answer is complete.
+    """
+    session_id = request.sessionId if request.sessionId else str(uuid.uuid4())
+    userId = request.userId if request.userId else "anonymous"
+
+    async def event_stream():
+        # Headers are sent before any work is done, so timings go in the `done` event instead
+        timings = start_request("query_stream")
+        outcome = "error"
+        try:
+            yield sse_event("session", {"sessionId": session_id, "contentType": "markdown"})
+
+            query_embedding, cached_answer, context, chat_history, token_counts = await prepare_answer(request, session_id)
+
+            if cached_answer is not None:
+                response_text = cached_answer
+                yield sse_event("token", {"delta": cached_answer})
+            else:
+                parts = []
+                started = time.perf_counter()
+                async for token in stream_openai_with_context(request.prompt, context, chat_history):
+                    if not parts:
+                        timings.add("first_token", time.perf_counter() - started)
+                    parts.append(token)
+                    yield sse_event("token", {"delta": token})
+                timings.add("llm", time.perf_counter() - started)
+
+                response_text = "".join(parts).strip()
+                remember_answer(query_embedding, request, chat_history, response_text)
+            chat_payload = {
+                "sessionId": session_id,
+                "query": request.prompt,
+                "response": response_text,
+                "createdAt": datetime.utcnow(),
+                "updatedAt": datetime.utcnow(),
+                "userId": userId,
+                "tokenCounts": token_counts,
+            }
+            with timed_stage("store"):
+                await write_chat_record_async(chat_payload)
+            schedule_summary_update(session_id)
+            outcome = "cached" if cached_answer is not None else "ok"
+            yield sse_event("done", {"sessionId": session_id, "timings": timings.as_dict()})
+        except Exception as e:
+            # Retrieval, history, generation or storage: the client always gets a terminal event
+            yield sse_event("error", {"message": str(e)})
+        finally:
+            timings.finish(outcome)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Stage latency histograms, token counts and cache hit rates in the Prometheus text format."""
+    gauges = {}
+    for prefix, cache in (("answer_cache", answer_cache), ("embedding_cache", embedding_cache)):
+        if cache is None:
+            continue
+        # The embedding cache counts its rows with a SQLite query; keep it off the event loop
+        stats = await asyncio.to_thread(cache.stats)
+        gauges[f"{prefix}_hits_total"] = stats["hits"]
+        gauges[f"{prefix}_misses_total"] = stats["misses"]
+        gauges[f"{prefix}_hit_ratio"] = round(stats["hit_rate"], 4)
+        gauges[f"{prefix}_entries"] = stats["entries"]
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+SESSION_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "sessionId": "$_id",
+    "userId": 1,
+    "count": 1,
+    "firstAt": 1,
+    "lastAt": 1,
+    "firstQuery": 1,
+}
+
+
+def encode_cursor(timestamp, key) -> str:
+    raw = json.dumps({"t": timestamp.isoformat() if timestamp else None, "k": str(key)})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (datetime.fromisoformat(raw["t"]) if raw["t"] else None), raw["k"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @app.get("/sessions")
-def get_sessions():
+async def get_sessions(
+    userId: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    mode: str = Query("full", pattern="^(summary|full)$"),
+    chats_limit: int = Query(20, ge=1, le=100),
+):
     """
-    Aggregate chat records grouped by sessionId.
-    Returns a list of sessions with their queries and responses.
+    List sessions, most recently active first, one page at a time.
+
+    Every session has its count, first/last timestamp and first query. `full` mode
+    (the default) also includes up to `chats_limit` of its latest chats; `summary`
+    mode leaves them out. Use /sessions/{session_id} to page through a whole
+    conversation. Pass the returned `nextCursor` back as `cursor` to fetch the
+    next page.
     """
+    query = {}
+    if userId:
+        query["userId"] = userId
+    if since or until:
+        query["lastAt"] = {}
+        if since:
+            query["lastAt"]["$gte"] = since
+        if until:
+            query["lastAt"]["$lte"] = until
+    if cursor:
+        last_at, session_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"lastAt": {"$lt": last_at}},
+            {"lastAt": last_at, "_id": {"$lt": session_id}},
+        ]
     pipeline = [
-        {
-            "$group": {
-                "_id": "$sessionId",
-                "chats": {
-                    "$push": {
-                        "query": "$query",
-                        "response": "$response",
-                        "createdAt": "$createdAt",
-                        "updatedAt": "$updatedAt",
-                    }
-                },
-                "userId": {"$first": "$userId"},
-            }
-        },
-        {"$project": {"sessionId": "$_id", "chats": 1, "userId": 1, "_id": 0}},
+        {"$match": query},
+        {"$sort": {"lastAt": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": SESSION_SUMMARY_PROJECTION},
     ]
-    sessions = list(db["chatHistorys"].aggregate(pipeline))
-    return {"sessions": sessions}
+    sessions = await async_db["chatSessions"].aggregate(pipeline).to_list(limit + 1)
+
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = encode_cursor(sessions[-1].get("lastAt"), sessions[-1]["sessionId"])
+
+    if mode == "full":
+        recent = await asyncio.gather(
+            *(fetch_session_chats(session["sessionId"], chats_limit) for session in sessions)
+        )
+        for session, (chats, _) in zip(sessions, recent):
+            session["chats"] = chats
+
+    return {"sessions": sessions, "nextCursor": next_cursor}
+
+
+async def fetch_session_chats(session_id: str, limit: int, cursor: Optional[str] = None, latest: bool = True):
+    """Return one page of a session's chats in chronological order, plus the cursor for the next page."""
+    query = {"sessionId": session_id}
+    direction = -1 if latest else 1
+    if cursor:
+        created_at, chat_id = decode_cursor(cursor)
+        if not ObjectId.is_valid(chat_id):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        op = "$lt" if latest else "$gt"
+        query["$or"] = [
+            {"createdAt": {op: created_at}},
+            {"createdAt": created_at, "_id": {op: ObjectId(chat_id)}},
+        ]
+    chats = await (
+        async_db["chatHistorys"]
+        .find(query, {"query": 1, "response": 1, "createdAt": 1, "updatedAt": 1})
+        .sort([("createdAt", direction), ("_id", direction)])
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+    next_cursor = None
+    if len(chats) > limit:
+        chats = chats[:limit]
+        next_cursor = encode_cursor(chats[-1].get("createdAt"), chats[-1]["_id"])
+    if latest:
+        chats.reverse()
+    for chat in chats:
+        chat["_id"] = str(chat["_id"])
+    return chats, next_cursor
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """Return a session's summary and one page of its chats, oldest first."""
+    session = await async_db["chatSessions"].find_one({"_id": session_id}, SESSION_SUMMARY_PROJECTION)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    chats, next_cursor = await fetch_session_chats(session_id, limit, cursor, latest=False)
+    session["chats"] = chats
+    session["nextCursor"] = next_cursor
+    return session
@@ -0,0 +1,153 @@
+import numpy as np
+from app.config import RRF_K
+
+
+class RetrievedChunk:
+    """A retrieved point, shaped like a Qdrant ScoredPoint (id, score, payload, vector)."""
+
+    def __init__(self, id, score, payload, vector=None):
+        self.id = id
+        self.score = score
+        self.payload = payload or {}
+        self.vector = vector
+
+    def __repr__(self):
+        return f"RetrievedChunk(id={self.id!r}, score={self.score:.4f})"
+
+
+def lexical_hits_to_chunks(hits):
+    """Convert (point_id, score, payload) tuples from the keyword index."""
+    return [RetrievedChunk(point_id, score, payload) for point_id, score, payload in hits]
+
+
+def reciprocal_rank_fusion(result_lists, limit, k=RRF_K):
+    """
+    Merge ranked result lists with reciprocal rank fusion.
+
+    Each list contributes 1 / (k + rank) for every point it returns, so points
+    ranked well by several retrievers rise to the top without having to compare
+    their raw scores.
+
+    Args:
+        result_lists: Lists of hits (anything with .id and .payload), best first
+        limit: Number of fused results to return
+        k: Damping constant; larger values flatten the rank weighting
+
+    Returns:
+        List of RetrievedChunk ordered by fused score
+    """
+    scores = {}
+    hits = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            key = str(hit.id)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            # Keep the first copy seen; vector hits come first and may carry vectors
+            hits.setdefault(key, hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [
+        RetrievedChunk(hits[key].id, scores[key], hits[key].payload, getattr(hits[key], "vector", None))
+        for key in ranked
+    ]
+
+
+def merge_overlapping_text(first, second, min_overlap=20):
+    """Join two consecutive chunks, dropping the text the splitter repeated between them."""
+    longest = min(len(first), len(second))
+    for size in range(longest, min_overlap - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+
+def collapse_adjacent_chunks(hits):
+    """
+    Merge hits that are consecutive chunks of the same source document.
+
+    Overlapping neighbours would otherwise put the shared text into the prompt
+    twice. The merged hit keeps the best score and vector of its parts and the
+    rank of its best part.
+    """
+    groups = {}
+    for position, hit in enumerate(hits):
+        payload = hit.payload or {}
+        module_type = payload.get("module_type")
+        source_id = payload.get(f"{module_type}_id")
+        index = payload.get("chunk_index")
+        if source_id is None or index is None:
+            groups[("hit", position)] = [(position, None, hit)]
+            continue
+        groups.setdefault((module_type, source_id), []).append((position, index, hit))
+
+    merged = []
+    for parts in groups.values():
+        parts.sort(key=lambda part: (part[1] is None, part[1]))
+        run = [parts[0]]
+        for part in parts[1:]:
+            if run[-1][1] is not None and part[1] == run[-1][1] + 1:
+                run.append(part)
+            else:
+                merged.append(_merge_run(run))
+                run = [part]
+        merged.append(_merge_run(run))
+    merged.sort(key=lambda item: item[0])
+    return [hit for _, hit in merged]
+
+
+def _merge_run(run):
+    if len(run) == 1:
+        return run[0][0], run[0][2]
+    best_position, _, best = min(run, key=lambda part: part[0])
+    text = run[0][2].payload.get("text", "")
+    for _, _, hit in run[1:]:
+        text = merge_overlapping_text(text, hit.payload.get("text", ""))
+    payload = dict(best.payload)
+    payload["text"] = text
+    payload["chunk_indexes"] = [part[1] for part in run]
+    return best_position, RetrievedChunk(best.id, best.score, payload, getattr(best, "vector", None))
+
+
+def mmr_select(hits, limit, lambda_=0.7, duplicate_similarity=0.95):
+    """
+    Pick `limit` hits by maximal marginal relevance.
+
+    Relevance is each hit's retrieval score scaled to [0, 1]; redundancy is the
+    highest cosine similarity to an already selected hit. Hits nearly identical
+    to a selected one (>= duplicate_similarity) are dropped outright. Hits
+    without vectors are only judged on relevance.
+
+    Returns:
+        Selected hits, in selection order
+    """
+    if len(hits) <= 1:
+        return list(hits)[:limit]
+    scores = np.array([float(hit.score or 0.0) for hit in hits], dtype=np.float32)
+    low, high = scores.min(), scores.max()
+    relevance = (scores - low) / (high - low) if high > low else np.ones_like(scores)
+
+    has_vector = np.array([getattr(hit, "vector", None) is not None for hit in hits])
+    vectors = np.zeros((len(hits), 0), dtype=np.float32)
+    if has_vector.any():
+        size = len(next(hit.vector for hit in hits if getattr(hit, "vector", None) is not None))
+        vectors = np.zeros((len(hits), size), dtype=np.float32)
+        for i, hit in enumerate(hits):
+            if has_vector[i]:
+                vectors[i] = hit.vector
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+    selected = []
+    redundancy = np.zeros(len(hits), dtype=np.float32)
+    available = np.ones(len(hits), dtype=bool)
+    while len(selected) < limit and available.any():
+        mmr = lambda_ * relevance - (1 - lambda_) * redundancy
+        mmr[~available] = -np.inf
+        choice = int(np.argmax(mmr))
+        selected.append(choice)
+        available[choice] = False
+        if has_vector[choice]:
+            similarity = vectors @ vectors[choice]
+            similarity[~has_vector] = 0.0
+            redundancy = np.maximum(redundancy, similarity)
+            available &= ~(similarity >= duplicate_similarity)
+    return [hits[i] for i in selected]
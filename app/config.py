@@ -7,4 +7,87 @@ QDRANT_HOST = os.environ.get("QDRANT_HOST")
 QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY")
 MONGO_URI = os.environ.get("MONGO_URI")
 MONGO_DB_NAME = os.environ.get("MONGO_DB_NAME")
-QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION")
\ No newline at end of file
+QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION")
+
+# "openai" or "local" (in-process hashing encoder, offline); switching needs a re-ingest into another collection
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small")
+
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "embeddings.sqlite3"),
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Embedding request budget (0 disables a limit); set to the account's text-embedding-3-small limits
+EMBEDDING_TPM_LIMIT = int(os.environ.get("EMBEDDING_TPM_LIMIT", "1000000"))
+EMBEDDING_RPM_LIMIT = int(os.environ.get("EMBEDDING_RPM_LIMIT", "3000"))
+EMBEDDING_MAX_RETRIES = int(os.environ.get("EMBEDDING_MAX_RETRIES", "6"))
+EMBEDDING_RETRY_BASE_SECONDS = float(os.environ.get("EMBEDDING_RETRY_BASE_SECONDS", "1"))
+EMBEDDING_RETRY_MAX_SECONDS = float(os.environ.get("EMBEDDING_RETRY_MAX_SECONDS", "60"))
+
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_VERSION_CHECK_SECONDS = int(os.environ.get("ANSWER_CACHE_VERSION_CHECK_SECONDS", "30"))
+
+HISTORY_MAX_TURNS = int(os.environ.get("HISTORY_MAX_TURNS", "10"))
+HISTORY_MAX_TOKENS = int(os.environ.get("HISTORY_MAX_TOKENS", "2000"))
+HISTORY_SUMMARY_ENABLED = os.environ.get("HISTORY_SUMMARY_ENABLED", "false").lower() == "true"
+HISTORY_SUMMARY_MODEL = os.environ.get("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+
+# One OCR process pool of PDF_PARSE_WORKERS, used for PDFs with at least PDF_PARALLEL_MIN_PAGES image-only pages
+PDF_PARSE_WORKERS = int(os.environ.get("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "2"))
+OCR_FAST_DPI = int(os.environ.get("OCR_FAST_DPI", "200"))
+OCR_FULL_DPI = int(os.environ.get("OCR_FULL_DPI", "300"))
+OCR_MIN_CONFIDENCE = float(os.environ.get("OCR_MIN_CONFIDENCE", "70"))
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+SOP_DOWNLOAD_WORKERS = int(os.environ.get("SOP_DOWNLOAD_WORKERS", "4"))
+
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "32"))
+PIPELINE_EXTRACT_WORKERS = int(os.environ.get("PIPELINE_EXTRACT_WORKERS", "2"))
+PIPELINE_CHUNK_WORKERS = int(os.environ.get("PIPELINE_CHUNK_WORKERS", "1"))
+PIPELINE_EMBED_WORKERS = int(os.environ.get("PIPELINE_EMBED_WORKERS", "4"))
+PIPELINE_UPLOAD_WORKERS = int(os.environ.get("PIPELINE_UPLOAD_WORKERS", "2"))
+
+# Embedding requests in flight at once; the pipeline's embed workers are the most callers there are
+EMBEDDING_MAX_CONCURRENCY = int(os.environ.get("EMBEDDING_MAX_CONCURRENCY", str(PIPELINE_EMBED_WORKERS)))
+
+# Ingestion telemetry: JSON log lines on the "app.ingest" logger, progress every N seconds
+INGEST_LOG_LEVEL = os.environ.get("INGEST_LOG_LEVEL", "INFO").upper()
+INGEST_PROGRESS_SECONDS = float(os.environ.get("INGEST_PROGRESS_SECONDS", "10"))
+# Where main.py writes the end-of-run summary JSON; unset to only log it
+INGEST_SUMMARY_PATH = os.environ.get("INGEST_SUMMARY_PATH")
+
+QDRANT_UPLOAD_BATCH_SIZE = int(os.environ.get("QDRANT_UPLOAD_BATCH_SIZE", "256"))
+QDRANT_UPLOAD_PARALLEL = int(os.environ.get("QDRANT_UPLOAD_PARALLEL", "4"))
+
+# "qdrant" or "local" (in-process NumPy index persisted under LOCAL_VECTOR_STORE_PATH)
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "qdrant")
+LOCAL_VECTOR_STORE_PATH = os.environ.get(
+    "LOCAL_VECTOR_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "vectors"),
+)
+LOCAL_VECTOR_STORE_DTYPE = os.environ.get("LOCAL_VECTOR_STORE_DTYPE", "float32")
+
+HYBRID_SEARCH_ENABLED = os.environ.get("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+# Candidates fetched per retriever before fusion and re-ranking trim them to top_k
+RETRIEVAL_CANDIDATES = int(os.environ.get("RETRIEVAL_CANDIDATES", "20"))
+RRF_K = int(os.environ.get("RRF_K", "60"))
+
+MMR_ENABLED = os.environ.get("MMR_ENABLED", "true").lower() == "true"
+MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA", "0.7"))
+DUPLICATE_SIMILARITY = float(os.environ.get("DUPLICATE_SIMILARITY", "0.95"))
+
+CHAT_MODEL = os.environ.get("CHAT_MODEL", "gpt-4o")
+# Total tokens one gpt-4o request may use (prompt + answer); context gets what is left
+PROMPT_MAX_TOKENS = int(os.environ.get("PROMPT_MAX_TOKENS", "8000"))
+ANSWER_MAX_TOKENS = int(os.environ.get("ANSWER_MAX_TOKENS", "1024"))
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", "3000"))
+
+# Documents per round trip when streaming source collections from Mongo
+FETCH_BATCH_SIZE = int(os.environ.get("FETCH_BATCH_SIZE", "200"))
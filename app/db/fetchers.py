@@ -1,33 +1,236 @@
-from app.db.mongo import db
+from datetime import datetime, timedelta
+from app.db.mongo import db, async_db
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.config import FETCH_BATCH_SIZE
 
 ENTITY_ID = ObjectId("67e58254b40e27710ecc0ee3")
+WATERMARK_COLLECTION = "ingestWatermarks"
+VERSION_COLLECTION = "collectionVersions"
 
-def fetch_documents_by_collection(collection_name, filters=None):
-    """Generic function to fetch documents from any collection"""
+# Fields each ingester reads, plus what upload_to_qdrant puts in the payload
+BASE_FIELDS = ["_id", "entityId", "title", "url", "createdAt", "updatedAt"]
+MODULE_PROJECTIONS = {
+    "tps": BASE_FIELDS + ["status", "description", "repeatCycle"],
+    "forms": BASE_FIELDS + ["category", "status", "visibility", "formType"],
+    "tasks": BASE_FIELDS + ["status", "description", "repeatCycle", "taskType"],
+    "audits": BASE_FIELDS + ["status", "repeatCycle", "auditType"],
+    "sops": BASE_FIELDS + ["sopType", "files", "raw_content", "content"],
+}
+
+def _after(last):
+    """Query for documents that sort after `last` in (updatedAt, _id) order"""
+    updated_at, doc_id = last.get("updatedAt"), last["_id"]
+    if updated_at is None:
+        # Missing/null updatedAt sorts first and can't be compared with $gt
+        return {"$or": [{"updatedAt": None, "_id": {"$gt": doc_id}}, {"updatedAt": {"$ne": None}}]}
+    return {"$or": [{"updatedAt": {"$gt": updated_at}}, {"updatedAt": updated_at, "_id": {"$gt": doc_id}}]}
+
+def _since(since):
+    """Query for documents after a watermark, a (updatedAt, _id) position or a bare `updatedAt`"""
+    if not isinstance(since, dict):
+        return {"updatedAt": {"$gt": since}}
+    if since.get("_id") is None:
+        # Recorded before watermarks kept the _id: documents sharing that updatedAt
+        # may not all have been ingested, so take them again
+        return {"updatedAt": {"$gte": since.get("updatedAt")}}
+    return _after(since)
+
+def iter_documents(collection_name, filters=None, since=None, projection=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    Stream documents from a collection, oldest `updatedAt` first
+
+    Documents are read a page of `batch_size` at a time, each page a short query
+    that resumes after the last (updatedAt, _id) seen. No server cursor is held
+    open between pages, so a consumer that stalls for longer than the cursor
+    timeout (e.g. behind slow OCR) doesn't break the fetch.
+
+    Args:
+        collection_name: Mongo collection to read
+        filters: Extra query conditions
+        since: Only return documents after this watermark (see get_watermark) or `updatedAt`
+        projection: Fields to return; defaults to the module's projection, if any
+        batch_size: Documents per page
+    """
     collection = db[collection_name]
     query = {"entityId": ENTITY_ID}
     
     if filters:
         query.update(filters)
+    if since is not None:
+        query = {"$and": [query, _since(since)]}
+    if projection is None:
+        projection = MODULE_PROJECTIONS.get(collection_name)
+    if isinstance(projection, (list, tuple)) and "updatedAt" not in projection:
+        # Needed to resume after the last document of a page
+        projection = list(projection) + ["updatedAt"]
     
-    documents = list(collection.find(query))
-    return documents
+    # Oldest changes first so a watermark can advance as documents succeed
+    last = None
+    while True:
+        page_query = query if last is None else {"$and": [query, _after(last)]}
+        page = list(
+            collection.find(page_query, projection).sort([("updatedAt", 1), ("_id", 1)]).limit(batch_size)
+        )
+        yield from page
+        if len(page) < batch_size:
+            return
+        last = page[-1]
+
+def fetch_documents_by_collection(collection_name, filters=None, since=None):
+    """Generic function to fetch documents from any collection (lazily, see iter_documents)"""
+    return iter_documents(collection_name, filters=filters, since=since)
+
+def fetch_document_ids(collection_name, filters=None):
+    """Return the string `_id` of every document, without loading the documents"""
+    query = {"entityId": ENTITY_ID}
+    if filters:
+        query.update(filters)
+    cursor = db[collection_name].find(query, {"_id": 1}).batch_size(5000)
+    return [str(doc["_id"]) for doc in cursor]
+
+def fetch_all_trainings(since=None):
+    return fetch_documents_by_collection("tps", since=since)
 
-def fetch_all_trainings():
-    return fetch_documents_by_collection("tps")
+def fetch_all_forms(since=None):
+    return fetch_documents_by_collection("forms", since=since)
 
-def fetch_all_forms():
-    return fetch_documents_by_collection("forms")
+def fetch_all_tasks(since=None):
+    return fetch_documents_by_collection("tasks", since=since)
 
-def fetch_all_tasks():
-    return fetch_documents_by_collection("tasks")
+def fetch_all_audits(since=None):
+    return fetch_documents_by_collection("audits", since=since)
 
-def fetch_all_audits():
-    return fetch_documents_by_collection("audits")
+def get_watermark(source, target):
+    """
+    Return how far ingestion from `source` into `target` has progressed, or None
+
+    Returns:
+        {"updatedAt": ..., "_id": ...} of the last document ingested, in the
+        (updatedAt, _id) order iter_documents reads in; `_id` is None for
+        watermarks recorded before it was kept
+    """
+    record = db[WATERMARK_COLLECTION].find_one({"_id": f"{target}:{source}"})
+    if not record:
+        return None
+    return {"updatedAt": record.get("updatedAt"), "_id": record.get("lastId")}
+
+def set_watermark(source, target, last):
+    """Record the (updatedAt, _id) of the last document ingested from `source` into `target`"""
+    if last is None:
+        return
+    db[WATERMARK_COLLECTION].update_one(
+        {"_id": f"{target}:{source}"},
+        {"$set": {"source": source, "target": target, "updatedAt": last.get("updatedAt"), "lastId": last["_id"]}},
+        upsert=True,
+    )
+
+def mark_collection_updated(collection_name):
+    """Bump the version of a vector collection so API-side caches built on it are dropped"""
+    db[VERSION_COLLECTION].update_one(
+        {"_id": collection_name},
+        {"$inc": {"version": 1}, "$currentDate": {"updatedAt": True}},
+        upsert=True,
+    )
+
+async def get_collection_version_async(collection_name):
+    record = await async_db[VERSION_COLLECTION].find_one({"_id": collection_name})
+    return record.get("version", 0) if record else 0
+
+SESSION_COLLECTION = "chatSessions"
+# One-off data migrations that have completed, by name
+MIGRATION_COLLECTION = "appMigrations"
+CHAT_SESSIONS_BACKFILL = "chatSessionsBackfill"
+# A migration claimed this long ago without completing is assumed abandoned
+MIGRATION_CLAIM_TIMEOUT = timedelta(hours=1)
+
+def session_summary_update(chat_payload):
+    """Upsert that keeps a session's summary document (count, first/last timestamp, first query) current"""
+    created_at = chat_payload.get("createdAt")
+    return {
+        "$setOnInsert": {
+            "firstAt": created_at,
+            "firstQuery": chat_payload.get("query", ""),
+            "userId": chat_payload.get("userId"),
+        },
+        "$max": {"lastAt": created_at},
+        "$inc": {"count": 1},
+    }
 
 def write_chat_record(chat_payload):
     """Insert a chat record into the chat collection"""
     collection = db["chatHistorys"]
     result = collection.insert_one(chat_payload)
-    return str(result.inserted_id)
\ No newline at end of file
+    db[SESSION_COLLECTION].update_one(
+        {"_id": chat_payload["sessionId"]}, session_summary_update(chat_payload), upsert=True
+    )
+    return str(result.inserted_id)
+
+async def write_chat_record_async(chat_payload):
+    """Insert a chat record into the chat collection without blocking the event loop"""
+    collection = async_db["chatHistorys"]
+    result = await collection.insert_one(chat_payload)
+    await async_db[SESSION_COLLECTION].update_one(
+        {"_id": chat_payload["sessionId"]}, session_summary_update(chat_payload), upsert=True
+    )
+    return str(result.inserted_id)
+
+def chat_sessions_pipeline():
+    """Aggregation that (re)computes chatSessions summaries from chatHistorys records"""
+    return [
+        {"$sort": {"sessionId": 1, "createdAt": 1}},
+        {
+            "$group": {
+                "_id": "$sessionId",
+                "count": {"$sum": 1},
+                "firstAt": {"$first": "$createdAt"},
+                "lastAt": {"$last": "$createdAt"},
+                "firstQuery": {"$first": "$query"},
+                "userId": {"$first": "$userId"},
+            }
+        },
+        {"$merge": {"into": SESSION_COLLECTION, "on": "_id", "whenMatched": "merge", "whenNotMatched": "insert"}},
+    ]
+
+def rebuild_chat_sessions():
+    """Backfill chatSessions summaries from existing chatHistorys records"""
+    db["chatHistorys"].aggregate(chat_sessions_pipeline(), allowDiskUse=True)
+    db[MIGRATION_COLLECTION].update_one(
+        {"_id": CHAT_SESSIONS_BACKFILL}, {"$currentDate": {"completedAt": True}}, upsert=True
+    )
+
+async def backfill_chat_sessions_async():
+    """
+    Run the chatSessions backfill once per database; returns whether it ran
+
+    Every server worker calls this on startup. The first to claim the migration
+    record runs it and the others skip; a claim left by a worker that died
+    mid-run is taken over once it is MIGRATION_CLAIM_TIMEOUT old.
+    """
+    migrations = async_db[MIGRATION_COLLECTION]
+    if await migrations.find_one({"_id": CHAT_SESSIONS_BACKFILL, "completedAt": {"$exists": True}}):
+        return False
+    now = datetime.utcnow()
+    try:
+        # Matches no record, or a stale claim; otherwise the upsert collides on _id
+        await migrations.update_one(
+            {
+                "_id": CHAT_SESSIONS_BACKFILL,
+                "completedAt": {"$exists": False},
+                "startedAt": {"$lt": now - MIGRATION_CLAIM_TIMEOUT},
+            },
+            {"$set": {"startedAt": now}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    try:
+        await async_db["chatHistorys"].aggregate(chat_sessions_pipeline(), allowDiskUse=True).to_list(None)
+    except Exception:
+        # Release the claim so the next start tries again
+        await migrations.delete_one({"_id": CHAT_SESSIONS_BACKFILL, "startedAt": now})
+        raise
+    await migrations.update_one(
+        {"_id": CHAT_SESSIONS_BACKFILL}, {"$currentDate": {"completedAt": True}}, upsert=True
+    )
+    return True
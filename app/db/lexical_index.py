@@ -0,0 +1,89 @@
+from pymongo import UpdateOne, DeleteMany
+from app.db.mongo import db, async_db
+
+# Keyword index over the same chunks that are uploaded to the vector store.
+# Each document is keyed by its vector point ID so both indexes stay in step.
+LEXICAL_COLLECTION = "chunkIndex"
+
+LEXICAL_FIELDS = ("text", "title", "url", "module_type", "entityId")
+
+
+def ensure_lexical_index():
+    collection = db[LEXICAL_COLLECTION]
+    collection.create_index([("text", "text"), ("title", "text")], weights={"title": 3, "text": 1})
+    collection.create_index([("collection", 1), ("module_type", 1), ("source_id", 1)])
+
+
+def lexical_entry(collection, point):
+    """Build the upsert for one vector point."""
+    payload = point.payload or {}
+    module_type = payload.get("module_type")
+    entry = {key: payload.get(key) for key in LEXICAL_FIELDS}
+    entry.update(
+        {
+            "collection": collection,
+            "source_id": payload.get(f"{module_type}_id"),
+            "payload": payload,
+        }
+    )
+    return UpdateOne({"_id": str(point.id)}, {"$set": entry}, upsert=True)
+
+
+def index_points(collection, points):
+    """Add or replace the keyword entries of vector points."""
+    operations = [lexical_entry(collection, point) for point in points]
+    if operations:
+        db[LEXICAL_COLLECTION].bulk_write(operations, ordered=False)
+
+
+def _source_query(collection, module_type, source_id, keep_ids=()):
+    query = {"collection": collection, "module_type": module_type, "source_id": str(source_id)}
+    if keep_ids:
+        query["_id"] = {"$nin": [str(i) for i in keep_ids]}
+    return query
+
+
+def remove_source_entries(collection, module_type, source_id, keep_ids=()):
+    """Remove a source document's entries except `keep_ids`."""
+    db[LEXICAL_COLLECTION].delete_many(_source_query(collection, module_type, source_id, keep_ids))
+
+
+def remove_stale_entries(collection, removals):
+    """
+    remove_source_entries() for many documents in one round trip.
+
+    Args:
+        removals: List of (module_type, source_id, keep_ids) tuples
+    """
+    operations = [DeleteMany(_source_query(collection, *removal)) for removal in removals]
+    if operations:
+        db[LEXICAL_COLLECTION].bulk_write(operations, ordered=False)
+
+
+def remove_entries(point_ids):
+    ids = [str(i) for i in point_ids]
+    for start in range(0, len(ids), 1000):
+        db[LEXICAL_COLLECTION].delete_many({"_id": {"$in": ids[start:start + 1000]}})
+
+
+def clear_collection(collection):
+    db[LEXICAL_COLLECTION].delete_many({"collection": collection})
+
+
+async def search_lexical(collection, query, limit=10, filters=None):
+    """
+    Keyword search over indexed chunks, best match first.
+
+    Returns:
+        List of (point_id, score, payload) tuples
+    """
+    match = {"$text": {"$search": query}, "collection": collection}
+    if filters:
+        match.update(filters)
+    cursor = (
+        async_db[LEXICAL_COLLECTION]
+        .find(match, {"score": {"$meta": "textScore"}, "payload": 1})
+        .sort([("score", {"$meta": "textScore"})])
+        .limit(limit)
+    )
+    return [(doc["_id"], doc["score"], doc.get("payload") or {}) for doc in await cursor.to_list(limit)]
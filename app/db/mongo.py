@@ -1,6 +1,11 @@
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from app.config import MONGO_URI, MONGO_DB_NAME
 
 client = MongoClient(MONGO_URI)
 db = client[MONGO_DB_NAME]
 
+# Non-blocking handle for the API request path
+async_client = AsyncIOMotorClient(MONGO_URI)
+async_db = async_client[MONGO_DB_NAME]
+
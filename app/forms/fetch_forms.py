@@ -1,18 +1,9 @@
-from app.db.mongo import db
-from bson import ObjectId
+from app.db.fetchers import fetch_documents_by_collection
 
 
-def fetch_all_forms():
-    forms_collection = db["forms"]
-    documents = list(forms_collection.find({"entityId": ObjectId("67e58254b40e27710ecc0ee3")}))
-    return documents
+def fetch_all_forms(since=None):
+    return fetch_documents_by_collection("forms", since=since)
 
 def fetch_forms_by_type(form_type=None):
-    forms_collection = db["forms"]
-    query = {"entityId": ObjectId("67e58254b40e27710ecc0ee3")}
-    
-    if form_type:
-        query["formType"] = form_type
-    
-    documents = list(forms_collection.find(query))
-    return documents
\ No newline at end of file
+    filters = {"formType": form_type} if form_type else None
+    return list(fetch_documents_by_collection("forms", filters=filters))
@@ -1,55 +1,37 @@
 import os
-from app.forms.fetch_forms import fetch_all_forms
-from app.pdf.chunker import langchain_chunk
-from app.pdf.embedder import get_embedding
-from app.pdf.uploader import upload_to_qdrant
-from app.config import QDRANT_COLLECTION
-
-
-def process_all_forms():
-    forms = fetch_all_forms()
-    print(f"Found {len(forms)} forms in DB.")
-    
-    for form in forms:
-        form_id = str(form.get("_id"))
-        
-        try:
-            # Extract text from form content
-            title =  form.get("title", "")
-            category = form.get("category", "")
-            status = form.get("status", "")
-            visibility = form.get("visibility", "")
-
-            # Build content sections
-            content_parts = []
-
-            if title:
-                content_parts.append(f"Form Title: {title}")
-            if category:
-
-                content_parts.append(f"Category: {category}")
-            if status:
-                content_parts.append(f"Status: {status}")
-            if visibility:
-                content_parts.append(f"Visibility: {visibility}")
-
-            # Join all parts with double newlines for better separation
-            text = "\n\n".join(content_parts)
-
-            chunks = langchain_chunk(text)
-            print(f"📦 Chunked text into {len(chunks)} parts.")
-            
-            embedded = [(chunk, get_embedding(chunk)) for chunk in chunks]
-            
-            # Upload to Qdrant with updated signature
-            upload_to_qdrant(
-                chunks=embedded,
-                meta=form,  # Pass full form object
-                collection=QDRANT_COLLECTION,
-                module_type="form"
-            )
-            
-            print(f"✅ Uploaded {len(chunks)} chunks for Form {form_id}.")
-            
-        except Exception as e:
-            print(f"❌ Failed to process Form {form_id}: {e}")
\ No newline at end of file
+from app.pipeline.telemetry import IngestTelemetry
+
+
+def build_form_text(form):
+    """Flatten a form document into the text that gets chunked and embedded"""
+    # Extract text from form content
+    title =  form.get("title", "")
+    category = form.get("category", "")
+    status = form.get("status", "")
+    visibility = form.get("visibility", "")
+
+    # Build content sections
+    content_parts = []
+
+    if title:
+        content_parts.append(f"Form Title: {title}")
+    if category:
+
+        content_parts.append(f"Category: {category}")
+    if status:
+        content_parts.append(f"Status: {status}")
+    if visibility:
+        content_parts.append(f"Visibility: {visibility}")
+
+    # Join all parts with double newlines for better separation
+    return "\n\n".join(content_parts)
+
+
+def process_all_forms(incremental=True):
+    """Ingest forms on their own through the staged pipeline (see app.pipeline.runner)."""
+    # Imported here: the pipeline imports build_form_text from this module
+    from app.pipeline.runner import run_pipeline
+
+    telemetry = IngestTelemetry()
+    results = run_pipeline(["forms"], incremental=incremental, telemetry=telemetry)
+    return telemetry.finish(module="forms", sources=results)
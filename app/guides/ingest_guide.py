@@ -1,10 +1,11 @@
 import os
 import json
+import logging
 import datetime
-from bson import ObjectId
-from app.pdf.chunker import langchain_chunk
-from app.pdf.embedder import get_embedding
-from app.pdf.uploader import upload_to_qdrant
+from app.pdf.chunker import langchain_chunk, markdown_chunk, find_boilerplate_lines, strip_boilerplate
+from app.pdf.embedder import get_embeddings
+from app.pdf.uploader import upload_to_qdrant, prune_deleted_documents, BatchUploader
+from app.pipeline.telemetry import IngestTelemetry, emit
 from app.config import QDRANT_COLLECTION
 
 def load_json_files(directory_path):
@@ -27,12 +28,30 @@ def load_json_files(directory_path):
                     data = json.load(file)
                     data['filename'] = filename  # Add filename for reference
                     json_data.append(data)
-                    print(f"✅ Loaded: {filename}")
+                    emit("guide_loaded", logging.DEBUG, file=filename)
             except Exception as e:
-                print(f"❌ Error loading {filename}: {str(e)}")
+                emit("guide_load_failed", logging.WARNING, file=filename, error=str(e))
     
     return json_data
 
+def load_guides(directory_path):
+    """
+    Load the guide JSON files with the navigation and footer they all share removed
+
+    Args:
+        directory_path: Path to the directory containing JSON files
+
+    Returns:
+        List of dictionaries containing file data, with cleaned 'markdown'
+    """
+    json_data = load_json_files(directory_path)
+    boilerplate = find_boilerplate_lines(data.get('markdown', '') for data in json_data)
+    for data in json_data:
+        if data.get('markdown'):
+            data['markdown'] = strip_boilerplate(data['markdown'], boilerplate)
+    emit("guide_boilerplate", logging.DEBUG, files=len(json_data), lines=len(boilerplate))
+    return json_data
+
 def merge_json_content(json_data):
     """
     Merge all JSON files into a single document
@@ -63,7 +82,7 @@ def merge_json_content(json_data):
     
     # Create merged document
     merged_doc = {
-        '_id': ObjectId(),
+        '_id': 'how-to-guide-merged',
         'content': '\n'.join(merged_content),
         'source_files': source_files,
         'source_urls': all_urls,
@@ -89,48 +108,34 @@ def process_and_ingest_guides(directory_path=None):
     if directory_path is None:
         directory_path = os.path.dirname(os.path.abspath(__file__))
     
-    print(f"🔍 Processing JSON files in: {directory_path}")
+    emit("guides_merge_started", directory=directory_path)
     
     # Step 1: Load all JSON files
-    json_data = load_json_files(directory_path)
+    json_data = load_guides(directory_path)
     if not json_data:
-        print("❌ No JSON files found in directory")
+        emit("guides_missing", logging.ERROR, directory=directory_path, error="No JSON files found in directory")
         return
     
-    print(f"📁 Found {len(json_data)} JSON files")
-    
     # Step 2: Merge content
-    print("🔄 Merging JSON content...")
     merged_doc = merge_json_content(json_data)
-    
-    print(f"📝 Merged content length: {len(merged_doc['content'])} characters")
+    emit("guides_merged", files=len(json_data), characters=len(merged_doc['content']))
     
     # Step 3: Chunk the content
-    print("✂️ Chunking content...")
     chunks = langchain_chunk(
         merged_doc['content'], 
         chunk_size=1000,  # Larger chunks for guide content
         chunk_overlap=200
     )
     
-    print(f"📊 Created {len(chunks)} chunks")
-    
     # Step 4: Generate embeddings
-    print("🧠 Generating embeddings...")
-    embedded_chunks = []
-    for i, chunk in enumerate(chunks):
-        try:
-            embedding = get_embedding(chunk)
-            embedded_chunks.append((chunk, embedding))
-            if (i + 1) % 10 == 0:
-                print(f"   Processed {i + 1}/{len(chunks)} chunks")
-        except Exception as e:
-            print(f"❌ Error embedding chunk {i}: {str(e)}")
-    
-    print(f"✅ Generated {len(embedded_chunks)} embeddings")
+    try:
+        embedded_chunks = list(zip(chunks, get_embeddings(chunks)))
+    except Exception as e:
+        # Uploading nothing would delete the merged document's existing points
+        emit("guides_merge_failed", logging.ERROR, stage="embed", chunks=len(chunks), error=str(e))
+        return
     
     # Step 5: Upload to Qdrant
-    print("☁️ Uploading to Qdrant...")
     try:
         upload_to_qdrant(
             chunks=embedded_chunks,
@@ -138,18 +143,33 @@ def process_and_ingest_guides(directory_path=None):
             collection=QDRANT_COLLECTION,
             module_type="guide"
         )
-        print("🎉 Successfully uploaded how-to guides to Qdrant!")
-        
-        # Print summary
-        print("\n📋 Summary:")
-        print(f"   • Files processed: {merged_doc['total_files']}")
-        print(f"   • URLs included: {merged_doc['total_urls']}")
-        print(f"   • Chunks created: {len(embedded_chunks)}")
-        print(f"   • Collection: {QDRANT_COLLECTION}")
-        print(f"   • Module type: guide")
-        
     except Exception as e:
-        print(f"❌ Error uploading to Qdrant: {str(e)}")
+        emit("guides_merge_failed", logging.ERROR, stage="upload", chunks=len(chunks), error=str(e))
+        return
+    emit(
+        "guides_merge_done",
+        files=merged_doc['total_files'],
+        urls=merged_doc['total_urls'],
+        chunks=len(embedded_chunks),
+        collection=QDRANT_COLLECTION,
+        module_type="guide",
+    )
+
+def build_guide_meta(data):
+    """Build the document metadata for one guide JSON file"""
+    return {
+        # Stable per-file ID so re-runs replace this guide's points instead of duplicating them
+        '_id': data['filename'].replace('.json', ''),
+        'content': data.get('markdown', ''),
+        'filename': data['filename'],
+        'source_url': data.get('metadata', {}).get('url', ''),
+        'title': data.get('metadata', {}).get('title', data['filename']),
+        'description': data.get('metadata', {}).get('description', ''),
+        'content_type': 'how-to-guide',
+        'createdAt': datetime.datetime.now(),
+        'updatedAt': datetime.datetime.now(),
+        'entityId': data['filename'].replace('.json', ''),
+    }
 
 def process_individual_guides(directory_path=None):
     """
@@ -158,64 +178,82 @@ def process_individual_guides(directory_path=None):
     if directory_path is None:
         directory_path = os.path.dirname(os.path.abspath(__file__))
     
-    print(f"🔍 Processing individual JSON files in: {directory_path}")
+    telemetry = IngestTelemetry()
+    telemetry.start("guides", directory=directory_path)
     
-    json_data = load_json_files(directory_path)
+    json_data = load_guides(directory_path)
     if not json_data:
-        print("❌ No JSON files found in directory")
-        return
-    
-    total_chunks = 0
+        telemetry.error("guides", "fetch", "No JSON files found in directory")
+        return telemetry.finish(module="guides")
     
+    # Chunk every guide first so their chunks share embedding requests; most
+    # guides are far smaller than one request
+    guides = []
     for data in json_data:
-        print(f"\n📄 Processing: {data['filename']}")
-        
         # Create document metadata
-        doc_meta = {
-            '_id': ObjectId(),
-            'content': data.get('markdown', ''),
-            'filename': data['filename'],
-            'source_url': data.get('metadata', {}).get('url', ''),
-            'title': data.get('metadata', {}).get('title', data['filename']),
-            'description': data.get('metadata', {}).get('description', ''),
-            'content_type': 'how-to-guide',
-            'createdAt': datetime.datetime.now(),
-            'updatedAt': datetime.datetime.now(),
-            'entityId': data['filename'].replace('.json', ''),
-        }
+        doc_meta = build_guide_meta(data)
         
         if not doc_meta['content']:
-            print(f"   ⚠️ Skipping {data['filename']} - no markdown content")
+            telemetry.document_skipped("guides", data['filename'], reason="no markdown content")
             continue
         
-        # Chunk content
-        chunks = langchain_chunk(doc_meta['content'], chunk_size=800, chunk_overlap=150)
-        print(f"   ✂️ Created {len(chunks)} chunks")
-        
-        # Generate embeddings
-        embedded_chunks = []
-        for chunk in chunks:
-            try:
-                embedding = get_embedding(chunk)
-                embedded_chunks.append((chunk, embedding))
-            except Exception as e:
-                print(f"   ❌ Error embedding chunk: {str(e)}")
-        
-        if embedded_chunks:
+        try:
+            with telemetry.stage("guides", "chunk"):
+                chunks = markdown_chunk(doc_meta['content'], chunk_size=800, chunk_overlap=150)
+            guides.append((data['filename'], doc_meta, chunks))
+        except Exception as e:
+            telemetry.document_failed("guides", data['filename'], e)
+    
+    # Generate embeddings; a chunk that fails on its own is skipped, not its whole guide
+    all_chunks = [chunk for _, _, chunks in guides for chunk in chunks]
+    embedding_stats = {}
+    try:
+        with telemetry.stage("guides", "embed"):
+            embeddings = get_embeddings(all_chunks, stats=embedding_stats, skip_failed=True)
+    except Exception as e:
+        for filename, _, _ in guides:
+            telemetry.document_failed("guides", filename, e)
+        guides, embeddings = [], []
+    total_chars = sum(len(chunk) for chunk in all_chunks) or 1
+    
+    uploader = BatchUploader()
+    offset = 0
+    for filename, doc_meta, chunks in guides:
+        guide_embeddings = embeddings[offset:offset + len(chunks)]
+        offset += len(chunks)
+        embedded_chunks = [
+            (chunk, embedding) for chunk, embedding in zip(chunks, guide_embeddings) if embedding is not None
+        ]
+        if not embedded_chunks:
+            telemetry.document_failed("guides", filename, ValueError("No chunk could be embedded"), stage="embed")
+            continue
+        if len(embedded_chunks) < len(chunks):
+            emit("chunks_skipped", logging.WARNING, module="guides", id=filename,
+                 skipped=len(chunks) - len(embedded_chunks))
+        try:
             # Upload to Qdrant
-            try:
+            with telemetry.stage("guides", "upload"):
                 upload_to_qdrant(
                     chunks=embedded_chunks,
                     meta=doc_meta,
                     collection=QDRANT_COLLECTION,
-                    module_type="guide"
+                    module_type="guide",
+                    uploader=uploader,
                 )
-                total_chunks += len(embedded_chunks)
-                print(f"   ✅ Uploaded {len(embedded_chunks)} chunks")
-            except Exception as e:
-                print(f"   ❌ Error uploading: {str(e)}")
+            # Requests are shared between guides; attribute billed tokens by size
+            tokens = embedding_stats.get("tokens", 0) * sum(len(chunk) for chunk in chunks) // total_chars
+            telemetry.document_done("guides", filename, chunks=len(embedded_chunks), embedding_tokens=tokens)
+        except Exception as e:
+            telemetry.document_failed("guides", filename, e)
     
-    print(f"\n🎉 Completed! Total chunks uploaded: {total_chunks}")
+    with telemetry.stage("guides", "upload"):
+        uploader.close()
+
+    # Drop points of guide files that have been removed from the directory
+    live_ids = [data['filename'].replace('.json', '') for data in json_data]
+    prune_deleted_documents(QDRANT_COLLECTION, "guide", live_ids + ['how-to-guide-merged'])
+
+    return telemetry.finish(module="guides")
 
 if __name__ == "__main__":
     # You can choose which approach to use:
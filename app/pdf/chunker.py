@@ -1,5 +1,11 @@
+import os
+import re
+from collections import Counter
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*$")
+
+
 def langchain_chunk(text, chunk_size=500, chunk_overlap=100):
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
@@ -7,3 +13,171 @@ def langchain_chunk(text, chunk_size=500, chunk_overlap=100):
         separators=["\n\n", "\n", ".", " ", ""]
     )
     return splitter.split_text(text)
+
+
+def _heading(line):
+    """(level, title) if `line` is a markdown heading, else None."""
+    match = _HEADING.match(line.strip())
+    return (len(match.group(1)), match.group(2)) if match else None
+
+
+def find_boilerplate_lines(texts, min_share=0.5, min_documents=3):
+    """
+    Lines repeated across a set of documents, such as site navigation and page footers.
+
+    Args:
+        texts: Documents from the same source (e.g. every knowledge-base guide)
+        min_share: Fraction of the documents a line must appear in
+        min_documents: Below this many documents nothing counts as shared
+
+    Returns:
+        Set of boilerplate lines, stripped of surrounding whitespace
+    """
+    texts = list(texts)
+    if len(texts) < min_documents:
+        return set()
+    counts = Counter()
+    for text in texts:
+        counts.update({line.strip() for line in text.split("\n") if line.strip()})
+    threshold = max(min_documents, min_share * len(texts))
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def strip_boilerplate(text, boilerplate):
+    """
+    Remove boilerplate lines from `text`.
+
+    A boilerplate heading takes its whole section with it (down to the next
+    heading of the same or a higher level), since what a shared heading such
+    as "Related articles" introduces is template content too, even when the
+    lines under it differ between documents.
+    """
+    kept = []
+    skip_level = None
+    for line in text.split("\n"):
+        heading = _heading(line)
+        if skip_level is not None:
+            if heading is None or heading[0] > skip_level:
+                continue
+            skip_level = None
+        if line.strip() in boilerplate:
+            if heading is not None:
+                skip_level = heading[0]
+            continue
+        kept.append(line)
+    # Removed blocks leave runs of blank lines behind
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+
+def split_markdown_sections(text):
+    """
+    Split markdown at its headings.
+
+    Returns:
+        List of (enclosing heading titles, section text starting with its own heading)
+    """
+    sections = []
+    path = []  # (level, title) of the headings enclosing the current line
+    ancestors = []
+    lines = []
+    for line in text.split("\n"):
+        heading = _heading(line)
+        if heading is not None:
+            body = "\n".join(lines).strip()
+            if body:
+                sections.append((ancestors, body))
+            lines = []
+            path = [entry for entry in path if entry[0] < heading[0]]
+            ancestors = [title for _, title in path]
+            path.append(heading)
+        lines.append(line)
+    body = "\n".join(lines).strip()
+    if body:
+        sections.append((ancestors, body))
+    return sections
+
+
+def _breadcrumb(ancestors):
+    return " > ".join(ancestors) + "\n\n" if ancestors else ""
+
+
+def _path(ancestors, body):
+    """Titles of the headings in effect inside a section: its ancestors and its own heading."""
+    heading = _heading(body.split("\n", 1)[0])
+    return ancestors + [heading[1]] if heading is not None else ancestors
+
+
+def _render(sections):
+    """
+    Join packed (ancestors, body) sections into one chunk.
+
+    The chunk starts with the headings enclosing every section; a section
+    nested deeper gets its own line of titles unless the section before it
+    already shows them.
+    """
+    common = os.path.commonprefix([ancestors for ancestors, _ in sections])
+    parts = []
+    previous = common
+    for ancestors, body in sections:
+        shown = ancestors == common or ancestors == previous[:len(ancestors)]
+        parts.append(body if shown else _breadcrumb(ancestors) + body)
+        previous = _path(ancestors, body)
+    return _breadcrumb(common) + "\n\n".join(parts)
+
+
+def _bare_heading(sections):
+    """Whether the last of `sections` is only a heading, with its text in the next section."""
+    return bool(sections) and "\n" not in sections[-1][1] and _heading(sections[-1][1]) is not None
+
+
+def _split_section(context, body, chunk_size, chunk_overlap):
+    """Split one oversized section, keeping its headings with the first piece of its text."""
+    lines = body.split("\n")
+    lead = 0
+    while lead < len(lines) and (not lines[lead].strip() or _heading(lines[lead]) is not None):
+        lead += 1
+    heading = "\n".join(lines[:lead]).strip()
+    rest = "\n".join(lines[lead:]).strip()
+    if not heading or not rest:
+        heading, rest = "", body
+    else:
+        heading += "\n"
+    size = max(chunk_size - len(context) - len(heading), chunk_size // 2)
+    pieces = langchain_chunk(rest, size, min(chunk_overlap, size // 2))
+    if pieces:
+        pieces[0] = heading + pieces[0]
+    return [context + piece for piece in pieces]
+
+
+def markdown_chunk(text, chunk_size=800, chunk_overlap=150):
+    """
+    Chunk markdown along its heading structure.
+
+    Consecutive sections are packed together up to `chunk_size` characters;
+    a section that is larger on its own is split with langchain_chunk. Each
+    chunk starts with the titles of the headings enclosing it, so it still
+    reads in context when retrieved alone. A heading always stays in the
+    same chunk as the start of the text under it.
+    """
+    chunks = []
+    buffer = []  # (ancestors, body) of the sections packed so far
+
+    def flush():
+        if buffer:
+            chunks.append(_render(buffer))
+
+    for ancestors, body in split_markdown_sections(text):
+        section = (ancestors, body)
+        if buffer and len(_render(buffer + [section])) > chunk_size:
+            carried = [buffer.pop()] if _bare_heading(buffer) else []
+            flush()
+            buffer = carried
+        if len(_render(buffer + [section])) > chunk_size:
+            # Too large even on its own: only a carried heading can be left in the buffer
+            lead = "".join(heading + "\n" for _, heading in buffer)
+            buffer = []
+            chunks.extend(_split_section(_breadcrumb(ancestors), lead + body, chunk_size, chunk_overlap))
+            continue
+        buffer.append(section)
+    flush()
+    return chunks
@@ -0,0 +1,65 @@
+import io
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.config import HTTP_POOL_SIZE
+
+CHUNK_SIZE = 1024 * 256
+
+_local = threading.local()
+
+
+def get_session():
+    """Keep-alive session with a connection pool and retries, one per thread."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _local.session = session
+    return session
+
+
+def download_bytes(url, timeout=60):
+    """Stream a file into memory over a pooled connection and return its bytes."""
+    buffer = io.BytesIO()
+    with get_session().get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def download_to_file(url, local_path, timeout=60):
+    """Stream a file to disk over a pooled connection without buffering it whole."""
+    with get_session().get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(local_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+    return local_path
+
+
+def prefetch(items, fetch, workers=4):
+    """
+    Run `fetch(item)` ahead of the consumer on a thread pool.
+
+    At most `workers` fetches are in flight or waiting to be consumed, so memory
+    stays bounded however many items there are.
+
+    Yields:
+        (item, future) tuples in input order
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(fetch, item)))
+            if len(pending) >= workers:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
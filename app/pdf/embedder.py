@@ -1,13 +1,221 @@
-import os
-from openai import OpenAI
-from app.config import OPENAI_API_KEY
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-def get_embedding(text, model="text-embedding-3-small"):
-    # Set dimensions=384 for 384-dim embeddings
-    response = client.embeddings.create(input=[text], model=model, dimensions=384)
-    embedding = response.data[0].embedding
-    if len(embedding) != 384:
-        raise ValueError(f"Embedding size {len(embedding)} does not match expected 384 dimensions.")
+import asyncio
+import logging
+import threading
+from app.config import EMBEDDING_CACHE_ENABLED
+from app.pdf.embedding_backends import EMBEDDING_DIMENSIONS, create_backend
+from app.pdf.embedding_cache import EmbeddingCache, cache_key
+from app.pdf.embedding_scheduler import EmbeddingScheduler
+from app.pdf.tokens import count_tokens_with
+
+log = logging.getLogger(__name__)
+
+cache = EmbeddingCache() if EMBEDDING_CACHE_ENABLED else None
+scheduler = EmbeddingScheduler()
+
+# OpenAI caps a single embeddings request at 2048 inputs and 300k tokens in total
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The configured embedding backend (EMBEDDING_BACKEND), created on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the embedding backend, e.g. with a fake in benchmarks."""
+    global _backend
+    _backend = backend
+
+
+def count_tokens(text):
+    """Tokens of `text` as the embedding models count them."""
+    return count_tokens_with("cl100k_base", text)
+
+
+def _check_dimensions(embedding):
+    if len(embedding) != EMBEDDING_DIMENSIONS:
+        raise ValueError(
+            f"Embedding size {len(embedding)} does not match expected {EMBEDDING_DIMENSIONS} dimensions."
+        )
     return embedding
+
+
+def _embed_batch(backend, texts, model=None, tokens=None):
+    """One request's worth of texts, through the scheduler when the backend is rate limited."""
+    if not backend.rate_limited:
+        return backend.embed(texts, model)
+    if tokens is None:
+        tokens = sum(count_tokens(text) for text in texts)
+    return scheduler.call(lambda: backend.embed(texts, model), tokens)
+
+
+def get_embedding(text, model=None):
+    backend = get_backend()
+    if cache is not None:
+        key = cache_key(text, model or backend.model, EMBEDDING_DIMENSIONS)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    embeddings, _ = _embed_batch(backend, [text], model)
+    embedding = _check_dimensions(embeddings[0])
+    if cache is not None:
+        cache.put(key, embedding)
+    return embedding
+
+
+async def get_embedding_async(text, model=None):
+    """Non-blocking variant of get_embedding for the API request path."""
+    backend = get_backend()
+    if cache is not None:
+        key = cache_key(text, model or backend.model, EMBEDDING_DIMENSIONS)
+        # SQLite calls block; keep them off the event loop
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+    embeddings, _ = await backend.embed_async([text], model)
+    embedding = _check_dimensions(embeddings[0])
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, embedding)
+    return embedding
+
+
+def iter_batches(texts, batch_size=100, max_tokens=MAX_TOKENS_PER_REQUEST, token_counts=None):
+    """
+    Group texts into request-sized batches.
+
+    Args:
+        texts: List of strings to embed
+        batch_size: Maximum number of inputs per request
+        max_tokens: Maximum total tokens per request
+        token_counts: Token count of each text, if already known
+
+    Yields:
+        Lists of (index, text) tuples, in input order
+    """
+    batch_size = max(1, min(batch_size, MAX_INPUTS_PER_REQUEST))
+    batch = []
+    batch_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = token_counts[index] if token_counts is not None else count_tokens(text)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((index, text))
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def _embed_individually(backend, texts, model=None, token_counts=None):
+    """
+    Embed `texts` one request each, after a batch containing them failed.
+
+    Returns:
+        (embeddings with None for the texts that failed again, tokens billed, requests made)
+    """
+    embeddings = []
+    billed = 0
+    for i, text in enumerate(texts):
+        try:
+            (embedding,), tokens = _embed_batch(backend, [text], model, token_counts[i] if token_counts else None)
+        except Exception as e:
+            log.warning("Skipping a chunk that failed to embed: %s", e)
+            embedding, tokens = None, 0
+        embeddings.append(embedding)
+        billed += tokens
+    return embeddings, billed, len(texts)
+
+
+def get_embeddings(texts, model=None, batch_size=100, stats=None, skip_failed=False):
+    """
+    Embed many texts with as few requests as possible.
+
+    Requests to a rate-limited backend go through `scheduler`, which keeps them
+    within the limits and retries rate-limited or failed ones instead of
+    failing the document.
+
+    Args:
+        texts: List of strings to embed
+        model: Embedding model name; the backend's own model by default
+        batch_size: Maximum number of inputs packed into one request
+        stats: Optional dict; "requests", "tokens" (as billed) and "cached" are added to it,
+            and "failed" with `skip_failed`
+        skip_failed: When a request still fails after the scheduler's retries, embed its
+            texts one by one and return None for those that fail again, instead of raising
+
+    Returns:
+        List of 384-dim embeddings in the same order as `texts`
+    """
+    backend = get_backend()
+    texts = list(texts)
+    embeddings = [None] * len(texts)
+
+    keys = [cache_key(text, model or backend.model, EMBEDDING_DIMENSIONS) for text in texts] if cache is not None else []
+    if cache is not None:
+        cached = cache.get_many(keys)
+        for i, key in enumerate(keys):
+            embeddings[i] = cached.get(key)
+
+    # Only send texts the cache couldn't answer, deduplicated
+    pending = {}
+    for i, text in enumerate(texts):
+        if embeddings[i] is None:
+            pending.setdefault(text, []).append(i)
+    unique_texts = list(pending)
+    if stats is not None:
+        stats["cached"] = stats.get("cached", 0) + len(texts) - sum(len(indexes) for indexes in pending.values())
+
+    # Only a rate-limited backend has a token budget to batch and pace against
+    if backend.rate_limited:
+        token_counts = [count_tokens(text) for text in unique_texts]
+    else:
+        token_counts = [0] * len(unique_texts)
+    for batch in iter_batches(unique_texts, batch_size=batch_size, token_counts=token_counts):
+        inputs = [text for _, text in batch]
+        try:
+            batch_embeddings, tokens = _embed_batch(
+                backend, inputs, model, sum(token_counts[index] for index, _ in batch)
+            )
+            requests = 1
+        except Exception as e:
+            if not skip_failed:
+                raise
+            if len(batch) == 1:
+                log.warning("Skipping a chunk that failed to embed: %s", e)
+                batch_embeddings, tokens, requests = [None], 0, 1
+            else:
+                # One bad input shouldn't cost the rest of the request
+                batch_embeddings, tokens, requests = _embed_individually(
+                    backend, inputs, model, [token_counts[index] for index, _ in batch]
+                )
+                requests += 1
+        if stats is not None:
+            stats["requests"] = stats.get("requests", 0) + requests
+            stats["tokens"] = stats.get("tokens", 0) + tokens
+        fresh = []
+        for (_, text), embedding in zip(batch, batch_embeddings):
+            if embedding is None:
+                continue
+            embedding = _check_dimensions(embedding)
+            for index in pending[text]:
+                embeddings[index] = embedding
+            if cache is not None:
+                fresh.append((keys[pending[text][0]], embedding))
+        if cache is not None:
+            cache.put_many(fresh)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing and not skip_failed:
+        raise ValueError(f"No embedding returned for inputs {missing}.")
+    if stats is not None and skip_failed:
+        stats["failed"] = stats.get("failed", 0) + len(missing)
+    return embeddings
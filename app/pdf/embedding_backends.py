@@ -0,0 +1,140 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+from app.config import OPENAI_API_KEY, EMBEDDING_BACKEND, EMBEDDING_MODEL
+
+EMBEDDING_DIMENSIONS = 384
+
+_WORD = re.compile(r"\w+")
+
+
+class OpenAIEmbeddingBackend:
+    """
+    OpenAI embeddings API, `text-embedding-3-small` shortened to 384 dimensions by default.
+
+    Clients are created on first use, so importing the embedder needs neither
+    network access nor an API key.
+    """
+
+    rate_limited = True
+
+    def __init__(self, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS, client=None, async_client=None):
+        self.model = model
+        self.dimensions = dimensions
+        self._client = client
+        self._async_client = async_client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            with self._lock:
+                if self._client is None:
+                    # Ingestion retries through the scheduler, which paces them against the rate limits
+                    self._client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        return self._async_client
+
+    @staticmethod
+    def _parse(response, count):
+        embeddings = [None] * count
+        # The API reports each item's position in the request; don't rely on response order
+        for item in response.data:
+            embeddings[item.index] = item.embedding
+        usage = getattr(response, "usage", None)
+        return embeddings, getattr(usage, "total_tokens", 0) or 0
+
+    def embed(self, texts, model=None):
+        """
+        Embed one request's worth of texts.
+
+        Returns:
+            (embeddings in input order, tokens billed)
+        """
+        response = self.client.embeddings.create(
+            input=list(texts), model=model or self.model, dimensions=self.dimensions
+        )
+        return self._parse(response, len(texts))
+
+    async def embed_async(self, texts, model=None):
+        response = await self.async_client.embeddings.create(
+            input=list(texts), model=model or self.model, dimensions=self.dimensions
+        )
+        return self._parse(response, len(texts))
+
+
+@lru_cache(maxsize=1 << 18)
+def _bucket(feature, dimensions):
+    """Stable (index, sign) of a feature; Python's hash() is salted per process."""
+    value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return value % dimensions, 1.0 if (value >> 63) & 1 else -1.0
+
+
+class HashingEmbeddingBackend:
+    """
+    In-process CPU encoder for offline development, tests and benchmarks.
+
+    Word unigrams and bigrams are hashed into `dimensions` signed buckets with
+    sublinear term frequency, then L2-normalised. Deterministic across runs and
+    machines; texts that share words score high cosine similarity, but there is
+    no semantic knowledge, so retrieval quality is well below the OpenAI model.
+    """
+
+    rate_limited = False
+
+    def __init__(self, dimensions=EMBEDDING_DIMENSIONS):
+        # Part of every cache key, so these vectors never mix with OpenAI ones
+        self.model = "local-hashing-v1"
+        self.dimensions = dimensions
+
+    def embed_one(self, text):
+        words = _WORD.findall(text.lower())
+        features = Counter(words)
+        features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if features:
+            indexes = np.empty(len(features), dtype=np.intp)
+            weights = np.empty(len(features), dtype=np.float32)
+            for i, (feature, count) in enumerate(features.items()):
+                indexes[i], sign = _bucket(feature, self.dimensions)
+                weights[i] = sign * (1.0 + math.log(count))
+            np.add.at(vector, indexes, weights)
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed(self, texts, model=None):
+        return [self.embed_one(text) for text in texts], 0
+
+    async def embed_async(self, texts, model=None):
+        # Microseconds per text; not worth a thread hop
+        return self.embed(texts, model)
+
+
+BACKENDS = {
+    "openai": OpenAIEmbeddingBackend,
+    "local": HashingEmbeddingBackend,
+}
+
+
+def create_backend(name=EMBEDDING_BACKEND):
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}.")
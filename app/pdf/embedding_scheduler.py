@@ -0,0 +1,208 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from app.config import (
+    EMBEDDING_TPM_LIMIT,
+    EMBEDDING_RPM_LIMIT,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RETRY_BASE_SECONDS,
+    EMBEDDING_RETRY_MAX_SECONDS,
+)
+from app.pipeline.telemetry import emit
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+class TokenBucket:
+    """
+    Budget of `per_minute` units, refilled continuously, holding at most a minute's worth.
+
+    acquire() reserves immediately and sleeps off any shortfall, so callers are
+    served in arrival order and a large request can't be starved by small ones.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount):
+        """Take `amount` units, blocking until the budget covers them. Returns the seconds waited."""
+        # More than a minute's worth can never be covered; let it through on a full bucket
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            self.available -= amount
+            wait = -self.available / self.rate if self.available < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class AdaptiveConcurrency:
+    """
+    Cap on requests in flight, adjusted additive-increase / multiplicative-decrease.
+
+    Halved on every rate-limit response, from the number of requests that were
+    actually in flight when fewer callers than `limit` are using it, then
+    raised by one after a full window (`limit` requests) of successes, up to
+    `maximum`.
+    """
+
+    def __init__(self, maximum, minimum=1):
+        self.maximum = max(minimum, maximum)
+        self.minimum = minimum
+        self.limit = self.maximum
+        self.active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            if self.limit >= self.maximum:
+                return
+            self._successes += 1
+            if self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+    def on_throttle(self, in_flight=None):
+        with self._condition:
+            current = self.limit if in_flight is None else min(self.limit, in_flight)
+            self.limit = max(self.minimum, current // 2)
+            self._successes = 0
+            return self.limit
+
+
+def retry_after(error):
+    """Seconds the API asked us to wait, from the `retry-after(-ms)` headers, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class EmbeddingScheduler:
+    """
+    Runs embedding requests within the account's tokens- and requests-per-minute
+    limits, shared by every thread of the process.
+
+    Requests are admitted through an adaptive concurrency cap and two token
+    buckets (a limit of 0 disables that bucket). Rate limits, timeouts,
+    connection errors and 5xx responses are retried with full-jitter
+    exponential backoff, never shorter than the server's Retry-After.
+    """
+
+    def __init__(
+        self,
+        tpm=EMBEDDING_TPM_LIMIT,
+        rpm=EMBEDDING_RPM_LIMIT,
+        max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+        max_retries=EMBEDDING_MAX_RETRIES,
+        base_delay=EMBEDDING_RETRY_BASE_SECONDS,
+        max_delay=EMBEDDING_RETRY_MAX_SECONDS,
+    ):
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "tokens": 0, "retries": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self.counts[name] += amount
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(delay, retry_after(error) or 0.0)
+
+    def call(self, request, tokens):
+        """
+        Run `request()` once the budget allows, retrying transient failures.
+
+        Args:
+            request: Callable making one embeddings request
+            tokens: Input tokens of that request, as counted by tiktoken
+
+        Returns:
+            Whatever `request()` returns
+        """
+        attempt = 0
+        while True:
+            # Wait for the budget before taking a slot, so requests sleeping off the
+            # rate limit don't hold slots that requests with budget could use
+            waited = 0.0
+            if self.requests is not None:
+                waited += self.requests.acquire(1)
+            if self.tokens is not None:
+                waited += self.tokens.acquire(tokens)
+            with self.concurrency.slot():
+                self._count(requests=1, tokens=tokens, wait_seconds=waited)
+                try:
+                    result = request()
+                except RETRYABLE_ERRORS as e:
+                    error = e
+                    in_flight = self.concurrency.active
+                else:
+                    self.concurrency.on_success()
+                    return result
+
+            # An exhausted quota won't recover by waiting
+            if isinstance(error, RateLimitError) and getattr(error, "code", None) == "insufficient_quota":
+                raise error
+            attempt += 1
+            if attempt > self.max_retries:
+                raise error
+            throttled = isinstance(error, RateLimitError)
+            limit = self.concurrency.on_throttle(in_flight) if throttled else self.concurrency.limit
+            delay = self._backoff(attempt, error)
+            self._count(retries=1, throttled=int(throttled))
+            emit(
+                "embedding_retry",
+                logging.WARNING,
+                attempt=attempt,
+                delay=round(delay, 2),
+                concurrency=limit,
+                error=type(error).__name__,
+            )
+            # Sleep outside the slot so other requests aren't held up by this one's backoff
+            time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        counts["wait_seconds"] = round(counts["wait_seconds"], 3)
+        counts["concurrency"] = self.concurrency.limit
+        return counts
@@ -1,9 +1,5 @@
-from app.db.mongo import db
-from bson import ObjectId
+from app.db.fetchers import fetch_documents_by_collection
 
 
-
-def fetch_all_sops():
-    tasks_collection = db["sops"]
-    documents = list(tasks_collection.find({"entityId": ObjectId("67e58254b40e27710ecc0ee3")}))
-    return documents
\ No newline at end of file
+def fetch_all_sops(since=None):
+    return fetch_documents_by_collection("sops", since=since)
\ No newline at end of file
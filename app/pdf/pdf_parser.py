@@ -2,19 +2,189 @@ import fitz  # PyMuPDF
 from PIL import Image
 import pytesseract
 import io
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from app.config import (
+    PDF_PARSE_WORKERS,
+    PDF_PARALLEL_MIN_PAGES,
+    OCR_FAST_DPI,
+    OCR_FULL_DPI,
+    OCR_MIN_CONFIDENCE,
+)
+from app.pipeline.telemetry import emit
 
-def parse_pdf(file_path):
-    doc = fitz.open(file_path)
-    all_text = []
+# One OCR pool per process, shared by every thread that parses PDFs
+_pool = None
+_pool_lock = threading.Lock()
 
-    for page in doc:
-        text = page.get_text()
-        if text.strip():
-            all_text.append(text.strip())
+
+def open_pdf(source):
+    """Open a PDF from a file path or from in-memory bytes."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def get_ocr_pool(workers=PDF_PARSE_WORKERS):
+    """
+    The process pool that runs OCR, created on first use.
+
+    Workers are started with forkserver (spawn where unavailable): the
+    ingestion process already runs prefetch and pipeline threads, and forking
+    it can deadlock on locks those threads hold.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    return _pool
+
+
+def _render_png(page, dpi):
+    return page.get_pixmap(dpi=dpi).tobytes("png")
+
+
+def _ocr_png(png):
+    """OCR a rasterized page; returns (text, mean word confidence, seconds). Runs in the OCR pool."""
+    started = time.perf_counter()
+    img = Image.open(io.BytesIO(png))
+    data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        if not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        conf = float(data["conf"][i])
+        if conf >= 0:
+            confidences.append(conf)
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return text, confidence, time.perf_counter() - started
+
+
+def _needs_full_dpi(confidence):
+    return confidence < OCR_MIN_CONFIDENCE and OCR_FULL_DPI > OCR_FAST_DPI
+
+
+def _page_result(page_number, text, method, dpi, seconds):
+    return {"page": page_number, "text": text.strip(), "method": method, "dpi": dpi, "seconds": seconds}
+
+
+def parse_page(page):
+    """
+    Extract the text of one page, falling back to OCR for image-only pages.
+
+    OCR runs at OCR_FAST_DPI first and is only repeated at OCR_FULL_DPI when the
+    fast pass is not confident enough.
+
+    Returns:
+        Dict with page number, text, method, dpi and seconds spent
+    """
+    started = time.perf_counter()
+    text = page.get_text()
+    method, dpi = "text", None
+    if not text.strip():
+        method, dpi = "ocr", OCR_FAST_DPI
+        text, confidence, _ = _ocr_png(_render_png(page, OCR_FAST_DPI))
+        if _needs_full_dpi(confidence):
+            dpi = OCR_FULL_DPI
+            text, _, _ = _ocr_png(_render_png(page, OCR_FULL_DPI))
+    return _page_result(page.number, text, method, dpi, time.perf_counter() - started)
+
+
+def _ocr_pages_in_pool(doc, indexes, pool, max_in_flight):
+    """
+    OCR image-only pages in the pool; pages are rendered here and only PNG bytes are shipped.
+
+    Pages are rendered just before they are submitted, with at most
+    `max_in_flight` in the pool at once, so memory stays bounded on long
+    scanned documents and rendering overlaps with OCR.
+    """
+    pending = deque((index, OCR_FAST_DPI) for index in indexes)
+    in_flight = {}  # future -> (page index, dpi)
+    started = {}
+    results = {}
+    while pending or in_flight:
+        while pending and len(in_flight) < max_in_flight:
+            index, dpi = pending.popleft()
+            started.setdefault(index, time.perf_counter())
+            in_flight[pool.submit(_ocr_png, _render_png(doc[index], dpi))] = (index, dpi)
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            index, dpi = in_flight.pop(future)
+            text, confidence, _ = future.result()
+            if dpi == OCR_FAST_DPI and _needs_full_dpi(confidence):
+                # Retries go first so a finished page isn't held back behind the rest
+                pending.appendleft((index, OCR_FULL_DPI))
+            else:
+                results[index] = _page_result(index, text, "ocr", dpi, time.perf_counter() - started[index])
+    return results
+
+
+def parse_pdf_pages(source, workers=PDF_PARSE_WORKERS):
+    """
+    Parse every page of a PDF.
+
+    Pages with a text layer are read inline. Image-only pages are OCRed in the
+    shared process pool when there are at least PDF_PARALLEL_MIN_PAGES of them,
+    inline otherwise.
+
+    Args:
+        source: File path or PDF bytes
+        workers: Size of the OCR pool; 1 or less OCRs every page inline
+
+    Returns:
+        List of per-page result dicts (see parse_page), in page order
+    """
+    doc = open_pdf(source)
+    try:
+        pages = []
+        ocr_indexes = []
+        for page in doc:
+            started = time.perf_counter()
+            text = page.get_text()
+            if text.strip():
+                pages.append(_page_result(page.number, text, "text", None, time.perf_counter() - started))
+            else:
+                pages.append(None)
+                ocr_indexes.append(page.number)
+
+        if workers > 1 and len(ocr_indexes) >= PDF_PARALLEL_MIN_PAGES:
+            pool = get_ocr_pool(workers)
+            for index, result in _ocr_pages_in_pool(doc, ocr_indexes, pool, workers * 2).items():
+                pages[index] = result
         else:
-            pix = page.get_pixmap(dpi=300)
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            ocr_text = pytesseract.image_to_string(img)
-            all_text.append(ocr_text.strip())
+            for index in ocr_indexes:
+                pages[index] = parse_page(doc[index])
+        return pages
+    finally:
+        doc.close()
+
 
-    return "\n".join(all_text)
+def parse_pdf(source, workers=PDF_PARSE_WORKERS):
+    """Return the text of a PDF given as a file path or as in-memory bytes."""
+    started = time.perf_counter()
+    pages = parse_pdf_pages(source, workers=workers)
+    ocr_pages = [page for page in pages if page["method"] == "ocr"]
+    if pages:
+        slowest = max(pages, key=lambda page: page["seconds"])
+        emit(
+            "pdf_parsed",
+            logging.DEBUG,
+            pages=len(pages),
+            ocr_pages=len(ocr_pages),
+            seconds=round(time.perf_counter() - started, 3),
+            slowest_page=slowest["page"] + 1,
+            slowest_page_seconds=round(slowest["seconds"], 3),
+        )
+    return "\n".join(page["text"] for page in pages)
@@ -0,0 +1,36 @@
+import logging
+from functools import lru_cache
+import tiktoken
+
+log = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name):
+    """
+    The tiktoken encoding `name` ("cl100k_base", "o200k_base", ...), loaded once.
+
+    Returns:
+        The encoding, or None when offline without a cached copy (see TIKTOKEN_CACHE_DIR)
+    """
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        log.warning("tiktoken encoding %s unavailable, estimating token counts: %s", name, e)
+        return None
+
+
+def encoding_name_for_model(model, default="o200k_base"):
+    try:
+        return tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        return default
+
+
+def count_tokens_with(encoding_name, text):
+    """Tokens of `text` in the encoding `encoding_name`, estimated when it can't be loaded."""
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        # About four characters per token for English text
+        return len(text or "") // 4 + 1
+    return len(encoding.encode(text or "", disallowed_special=()))
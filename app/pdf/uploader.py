@@ -1,11 +1,55 @@
+import hashlib
+import logging
+import threading
 import uuid
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
-from app.config import QDRANT_HOST, QDRANT_API_KEY
+from concurrent.futures import ThreadPoolExecutor
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from app.pipeline.telemetry import emit
+from qdrant_client.models import (
+    VectorParams,
+    Distance,
+    PointStruct,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    HasIdCondition,
+    FilterSelector,
+    PointIdsList,
+    PayloadSchemaType,
+)
+from app.config import (
+    QDRANT_HOST,
+    QDRANT_API_KEY,
+    QDRANT_UPLOAD_BATCH_SIZE,
+    QDRANT_UPLOAD_PARALLEL,
+    VECTOR_STORE,
+    LOCAL_VECTOR_STORE_PATH,
+    LOCAL_VECTOR_STORE_DTYPE,
+    HYBRID_SEARCH_ENABLED,
+)
+from app.db import lexical_index
+from app.vectorstore.local_store import LocalVectorStore, AsyncLocalVectorStore
 from bson import ObjectId
+from app.db.fetchers import mark_collection_updated
 import regex
 
-client = QdrantClient(url=QDRANT_HOST, api_key=QDRANT_API_KEY)
+if VECTOR_STORE == "local":
+    client = LocalVectorStore(path=LOCAL_VECTOR_STORE_PATH, dtype=LOCAL_VECTOR_STORE_DTYPE)
+    async_client = AsyncLocalVectorStore(client)
+else:
+    client = QdrantClient(url=QDRANT_HOST, api_key=QDRANT_API_KEY)
+    async_client = AsyncQdrantClient(url=QDRANT_HOST, api_key=QDRANT_API_KEY)
+
+# Fixed namespace so point IDs are stable across runs and machines
+POINT_ID_NAMESPACE = uuid.UUID("5b2f7c1e-8a43-4d6b-9c0e-3f1a2d4e6b78")
+
+# Payload fields that /query filters on; each `<module>_id` is used by stale-point cleanup
+MODULE_TYPES = ("sop", "training", "form", "task", "audit", "guide")
+INDEXED_PAYLOAD_FIELDS = ("module_type", "entityId") + tuple(f"{m}_id" for m in MODULE_TYPES)
+
+# Collections already checked (or created) by this process
+_ensured_collections = set()
+_ensure_lock = threading.Lock()
 
 
 def sanitize_title(title: str) -> str:
@@ -37,7 +81,180 @@ def serialize_meta(meta):
     return serialized
 
 
-def upload_to_qdrant(chunks, meta, collection=QDRANT_HOST, module_type="sop"):
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def point_id(module_type, source_id, chunk_index, text):
+    """Deterministic point ID from (module_type, source _id, chunk index, content hash)."""
+    name = f"{module_type}:{source_id}:{chunk_index}:{content_hash(text)}"
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, name))
+
+
+def source_filter(module_type, source_id):
+    """Filter matching every point that belongs to one source document."""
+    return Filter(
+        must=[
+            FieldCondition(key="module_type", match=MatchValue(value=module_type)),
+            FieldCondition(key=f"{module_type}_id", match=MatchValue(value=str(source_id))),
+        ]
+    )
+
+
+def persist_store():
+    """Save the local vector store to disk; a no-op against a Qdrant server."""
+    if isinstance(client, LocalVectorStore):
+        client.persist()
+
+
+def create_payload_indexes(collection):
+    """Create keyword indexes for the filtered payload fields (idempotent)."""
+    for field_name in INDEXED_PAYLOAD_FIELDS:
+        client.create_payload_index(
+            collection_name=collection,
+            field_name=field_name,
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+
+
+def ensure_collection(collection, vector_size=384):
+    """Check that a collection exists, creating it if needed; done once per process."""
+    if collection in _ensured_collections:
+        return
+    with _ensure_lock:
+        if collection in _ensured_collections:
+            return
+        try:
+            client.get_collection(collection)
+        except Exception:
+            recreate_collection(collection=collection, vector_size=vector_size)
+        else:
+            # Collections created before payload indexing get their indexes here
+            create_payload_indexes(collection)
+        if HYBRID_SEARCH_ENABLED:
+            lexical_index.ensure_lexical_index()
+        _ensured_collections.add(collection)
+
+
+class BatchUploader:
+    """
+    Buffers points across documents and writes them in fixed-size batches.
+
+    Full batches are upserted on a small thread pool so several writes are in
+    flight at once. Call flush() to push what is buffered and close() (or use it
+    as a context manager) to wait for every outstanding write; errors from
+    background writes are raised there.
+
+    A document's stale points (chunks that were edited away) are deleted
+    together with the batch that carries its last new point, in one request
+    per batch, so the live index never shows a document without its chunks.
+    """
+
+    def __init__(self, batch_size=QDRANT_UPLOAD_BATCH_SIZE, parallel=QDRANT_UPLOAD_PARALLEL, wait=True,
+                 mark_updated=True, persist=True):
+        self.batch_size = batch_size
+        self.wait = wait
+        # Collections written are marked updated once, on close; False leaves that to the caller
+        self.mark_updated = mark_updated
+        # Likewise for saving the local vector store after a flush
+        self.persist = persist
+        self.updated_collections = set()
+        self._buffers = {}
+        self._removals = {}  # collection -> [(buffer position, module_type, source_id, keep_ids)]
+        self._futures = []
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, parallel))
+        self.points_written = 0
+
+    def add(self, collection, points, stale=None):
+        """
+        Buffer `points`; `stale` is an optional (module_type, source_id, keep_ids) whose
+        other points are deleted once these have been written.
+        """
+        ensure_collection(collection)
+        ready = []
+        with self._lock:
+            buffer = self._buffers.setdefault(collection, [])
+            buffer.extend(points)
+            removals = self._removals.setdefault(collection, [])
+            if stale is not None:
+                removals.append((len(buffer),) + tuple(stale))
+            self._dirty.add(collection)
+            while len(buffer) >= self.batch_size:
+                due = [removal[1:] for removal in removals if removal[0] <= self.batch_size]
+                removals[:] = [
+                    (removal[0] - self.batch_size,) + removal[1:]
+                    for removal in removals if removal[0] > self.batch_size
+                ]
+                ready.append((buffer[:self.batch_size], due))
+                del buffer[:self.batch_size]
+        for batch, due in ready:
+            self._submit(collection, batch, due)
+
+    def _submit(self, collection, batch, removals=()):
+        future = self._executor.submit(self._write, collection, batch, removals)
+        with self._lock:
+            self._futures.append(future)
+
+    def _write(self, collection, batch, removals=()):
+        if batch:
+            client.upsert(collection_name=collection, points=batch, wait=self.wait)
+            if HYBRID_SEARCH_ENABLED:
+                lexical_index.index_points(collection, batch)
+        if removals:
+            client.delete(
+                collection_name=collection,
+                points_selector=FilterSelector(
+                    filter=Filter(should=[stale_points_filter(*removal) for removal in removals])
+                ),
+                wait=self.wait,
+            )
+            if HYBRID_SEARCH_ENABLED:
+                lexical_index.remove_stale_entries(collection, removals)
+        with self._lock:
+            self.points_written += len(batch)
+
+    def flush(self):
+        """Send every buffered point and queued deletion and wait for all writes issued so far."""
+        with self._lock:
+            collections = set(self._buffers) | set(self._removals)
+            pending = [
+                (collection, self._buffers.get(collection, []),
+                 [removal[1:] for removal in self._removals.get(collection, [])])
+                for collection in collections
+            ]
+            self._buffers = {}
+            self._removals = {}
+        for collection, buffer, removals in pending:
+            if buffer or removals:
+                self._submit(collection, buffer, removals)
+        with self._lock:
+            futures, self._futures = self._futures, []
+            dirty, self._dirty = self._dirty, set()
+        for future in futures:
+            future.result()
+        if dirty and self.persist:
+            persist_store()
+        self.updated_collections |= dirty
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+        if self.mark_updated:
+            for collection in self.updated_collections:
+                mark_collection_updated(collection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def upload_to_qdrant(chunks, meta, collection=QDRANT_HOST, module_type="sop", uploader=None):
     """
     Upload embedded chunks to Qdrant with full metadata, including link references.
 
@@ -46,12 +263,9 @@ def upload_to_qdrant(chunks, meta, collection=QDRANT_HOST, module_type="sop"):
         meta: Dict containing document metadata (must include title + url for linking)
         collection: Qdrant collection name
         module_type: 'sop', 'training', 'form', 'task', 'audit', etc.
+        uploader: Optional BatchUploader; points are buffered there instead of written now
     """
-    # Ensure the collection exists
-    try:
-        client.get_collection(collection)
-    except Exception:
-        recreate_collection(collection=collection, vector_size=384)
+    ensure_collection(collection)
 
     serialized_meta = serialize_meta(meta)
     id_field = f"{module_type}_id"
@@ -59,17 +273,20 @@ def upload_to_qdrant(chunks, meta, collection=QDRANT_HOST, module_type="sop"):
     title = serialized_meta.get("title", "")
     url = serialized_meta.get("url", "")
 
+    source_id = str(serialized_meta.get("_id"))
     if not title or not url:
-        print(
-            "⚠️ Warning: Missing `title` or `url` in metadata. Links in markdown will not work properly."
-        )
+        # Links in the markdown answers will not work for these chunks
+        emit("missing_link_metadata", logging.WARNING, module_type=module_type, id=source_id,
+             title=bool(title), url=bool(url))
     points = [
         PointStruct(
-            id=str(uuid.uuid4()),
+            id=point_id(module_type, source_id, index, chunk),
             vector=embedding,
             payload={
                 "text": chunk,
-                id_field: str(serialized_meta.get("_id")),
+                id_field: source_id,
+                "chunk_index": index,
+                "content_hash": content_hash(chunk),
                 "createdAt": serialized_meta.get("createdAt"),
                 "updatedAt": serialized_meta.get("updatedAt"),
                 "entityId": str(serialized_meta.get("entityId")),
@@ -78,24 +295,114 @@ def upload_to_qdrant(chunks, meta, collection=QDRANT_HOST, module_type="sop"):
                 "url": url,
             },
         )
-        for chunk, embedding in chunks
+        for index, (chunk, embedding) in enumerate(chunks)
     ]
 
+    keep_ids = [point.id for point in points]
+    if uploader is not None:
+        # Stale points are deleted along with the batch that writes their replacements
+        uploader.add(collection, points, stale=(module_type, source_id, keep_ids))
+        return
+
     client.upsert(collection_name=collection, points=points)
-    print(
-        f"✅ Uploaded {len(points)} points to collection '{collection}' with enriched metadata."
+    if HYBRID_SEARCH_ENABLED:
+        lexical_index.index_points(collection, points)
+    remove_stale_points(collection, module_type, source_id, keep_ids)
+    persist_store()
+    emit("points_uploaded", logging.DEBUG, collection=collection, module_type=module_type, id=source_id,
+         points=len(points))
+
+
+def stale_points_filter(module_type, source_id, keep_ids):
+    """Filter matching the points of a source document that are not in `keep_ids`."""
+    stale_filter = source_filter(module_type, source_id)
+    if keep_ids:
+        stale_filter.must_not = [HasIdCondition(has_id=list(keep_ids))]
+    return stale_filter
+
+
+def remove_stale_points(collection, module_type, source_id, keep_ids, mark=True):
+    """Delete points of a source document that are not in `keep_ids` (edited or removed chunks)."""
+    client.delete(
+        collection_name=collection,
+        points_selector=FilterSelector(filter=stale_points_filter(module_type, source_id, keep_ids)),
+    )
+    if HYBRID_SEARCH_ENABLED:
+        lexical_index.remove_source_entries(collection, module_type, source_id, keep_ids)
+    if mark:
+        mark_collection_updated(collection)
+
+
+def delete_document_points(collection, module_type, source_id, uploader=None):
+    """Delete every point of a source document; with a BatchUploader, along with its next batch."""
+    if uploader is not None:
+        uploader.add(collection, [], stale=(module_type, source_id, []))
+        return
+    remove_stale_points(collection, module_type, source_id, [])
+
+
+def prune_deleted_documents(collection, module_type, live_source_ids, batch_size=1000, mark=True, persist=True):
+    """
+    Delete points whose source document no longer exists.
+
+    Args:
+        collection: Qdrant collection name
+        module_type: 'sop', 'training', 'form', 'task', 'audit', etc.
+        live_source_ids: IDs of every source document that still exists
+        batch_size: Scroll page size
+        mark: Bump the collection version when points were deleted
+        persist: Save the local vector store when points were deleted
+
+    Returns:
+        Number of points deleted
+    """
+    # A source that has never written anything may not have its collection yet
+    ensure_collection(collection)
+    id_field = f"{module_type}_id"
+    live = {str(source_id) for source_id in live_source_ids}
+    module_filter = Filter(
+        must=[FieldCondition(key="module_type", match=MatchValue(value=module_type))]
     )
+    stale_ids = []
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection,
+            scroll_filter=module_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=[id_field],
+            with_vectors=False,
+        )
+        stale_ids.extend(
+            record.id for record in records if (record.payload or {}).get(id_field) not in live
+        )
+        if offset is None:
+            break
+    if stale_ids:
+        client.delete(collection_name=collection, points_selector=PointIdsList(points=stale_ids))
+        if HYBRID_SEARCH_ENABLED:
+            lexical_index.remove_entries(stale_ids)
+        if persist:
+            persist_store()
+        if mark:
+            mark_collection_updated(collection)
+        emit("deleted_documents_pruned", collection=collection, module_type=module_type, points=len(stale_ids))
+    return len(stale_ids)
 
 def recreate_collection(collection="delightree_prod_docs", vector_size=1536):
     # Delete the collection if it exists, then create it with the correct vector size
     try:
         client.delete_collection(collection_name=collection)
-        print(f"🗑️ Deleted existing collection: {collection}")
+        emit("collection_deleted", logging.WARNING, collection=collection)
+        if HYBRID_SEARCH_ENABLED:
+            lexical_index.clear_collection(collection)
     except Exception:
-        print(f"ℹ️ Collection {collection} did not exist, creating new one.")
+        emit("collection_missing", logging.DEBUG, collection=collection)
 
     client.create_collection(
         collection_name=collection,
         vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
     )
-    print(f"✅ Created collection '{collection}' with vector size {vector_size}.")
\ No newline at end of file
+    create_payload_indexes(collection)
+    emit("collection_created", collection=collection, vector_size=vector_size)
\ No newline at end of file
@@ -0,0 +1,312 @@
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from app.config import (
+    QDRANT_COLLECTION,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_EXTRACT_WORKERS,
+    PIPELINE_CHUNK_WORKERS,
+    PIPELINE_EMBED_WORKERS,
+    PIPELINE_UPLOAD_WORKERS,
+)
+from app.db.fetchers import get_watermark, set_watermark, fetch_document_ids, mark_collection_updated
+from app.pdf.chunker import langchain_chunk, markdown_chunk
+from app.pdf.embedder import get_embeddings
+from app.pdf.uploader import (
+    upload_to_qdrant,
+    prune_deleted_documents,
+    delete_document_points,
+    persist_store,
+    BatchUploader,
+)
+from app.trainings.fetch_tps import fetch_all_trainings
+from app.trainings.ingest_tps import build_training_text, TRAINING_COLLECTION
+from app.forms.fetch_forms import fetch_all_forms
+from app.forms.ingest_forms import build_form_text
+from app.tasks.fetch_tasks import fetch_all_tasks
+from app.tasks.ingest_tasks import build_task_text
+from app.audits.fetch_audits import fetch_all_audits
+from app.audits.ingest_audits import build_audit_text
+from app.pdf.fetch_sops import fetch_all_sops
+from app.pdf.ingest_pdf import build_sop_text
+from app.guides.ingest_guide import load_guides, build_guide_meta
+from app.pipeline.telemetry import IngestTelemetry
+
+_STOP = object()
+
+
+@dataclass
+class Source:
+    """One document type fed into the pipeline."""
+
+    name: str
+    module_type: str
+    fetch: Callable  # since -> iterable of documents
+    extract: Callable  # document -> text, or None to skip
+    collection: str = QDRANT_COLLECTION
+    mongo_collection: Optional[str] = None  # enables watermarks and pruning
+    chunk_size: int = 500
+    chunk_overlap: int = 100
+    chunker: Callable = langchain_chunk  # (text, chunk_size, chunk_overlap) -> chunks
+    live_ids: Optional[Callable] = None  # () -> IDs of every existing document; enables pruning
+
+    def live_source_ids(self):
+        """IDs of every document that still exists, or None when the source can't be pruned."""
+        if self.live_ids is not None:
+            return self.live_ids()
+        if self.mongo_collection:
+            return fetch_document_ids(self.mongo_collection)
+        return None
+
+
+GUIDES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "guides")
+
+
+def _fetch_guides(since=None):
+    return [build_guide_meta(data) for data in load_guides(GUIDES_DIR)]
+
+
+def _guide_ids():
+    # Every guide file on disk, loadable or not, plus the merged document of process_and_ingest_guides
+    ids = [name[:-len(".json")] for name in os.listdir(GUIDES_DIR) if name.endswith(".json")]
+    return ids + ["how-to-guide-merged"]
+
+
+SOURCES = {
+    "trainings": Source("trainings", "training", fetch_all_trainings, build_training_text,
+                        collection=TRAINING_COLLECTION, mongo_collection="tps"),
+    "forms": Source("forms", "form", fetch_all_forms, build_form_text, mongo_collection="forms"),
+    "tasks": Source("tasks", "task", fetch_all_tasks, build_task_text, mongo_collection="tasks"),
+    "audits": Source("audits", "audit", fetch_all_audits, build_audit_text, mongo_collection="audits"),
+    "guides": Source("guides", "guide", _fetch_guides, lambda guide: guide.get("content", ""),
+                     chunk_size=800, chunk_overlap=150, chunker=markdown_chunk, live_ids=_guide_ids),
+    "sops": Source("sops", "sop", fetch_all_sops, build_sop_text, mongo_collection="sops"),
+}
+
+
+@dataclass
+class WorkItem:
+    source: Source
+    seq: int
+    doc: dict
+    text: Optional[str] = None
+    chunks: list = field(default_factory=list)
+    embedded: list = field(default_factory=list)
+    embedding_tokens: int = 0
+
+
+class IngestPipeline:
+    """
+    Staged ingestion: parse -> chunk -> embed -> upload.
+
+    Each stage has its own worker threads and reads from a bounded queue, so a
+    slow stage blocks the ones feeding it instead of letting work pile up in
+    memory. Network-bound stages (download, embed, upload) overlap with
+    CPU-bound ones (PDF parsing, OCR, chunking).
+    """
+
+    def __init__(
+        self,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        extract_workers=PIPELINE_EXTRACT_WORKERS,
+        chunk_workers=PIPELINE_CHUNK_WORKERS,
+        embed_workers=PIPELINE_EMBED_WORKERS,
+        upload_workers=PIPELINE_UPLOAD_WORKERS,
+        telemetry=None,
+    ):
+        # Text extraction is reported as "parse", like in the sequential ingesters
+        self.stages = [
+            ("parse", self._extract, extract_workers),
+            ("chunk", self._chunk, chunk_workers),
+            ("embed", self._embed, embed_workers),
+            ("upload", self._upload, upload_workers),
+        ]
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self.uploader = None
+        self.telemetry = telemetry or IngestTelemetry()
+        self._lock = threading.Lock()
+        # source name -> {seq: (succeeded, {"updatedAt", "_id"} of the document)}
+        self._outcomes = {}
+
+    # --- stages -------------------------------------------------------------
+
+    def _extract(self, item):
+        item.text = item.source.extract(item.doc)
+        if item.text is None:
+            return None
+        if not item.text:
+            delete_document_points(
+                item.source.collection, item.source.module_type, str(item.doc.get("_id")), uploader=self.uploader
+            )
+            return None
+        return item
+
+    def _chunk(self, item):
+        item.chunks = item.source.chunker(
+            item.text, chunk_size=item.source.chunk_size, chunk_overlap=item.source.chunk_overlap
+        )
+        return item
+
+    def _embed(self, item):
+        stats = {}
+        item.embedded = list(zip(item.chunks, get_embeddings(item.chunks, stats=stats)))
+        item.embedding_tokens = stats.get("tokens", 0)
+        return item
+
+    def _upload(self, item):
+        upload_to_qdrant(
+            chunks=item.embedded,
+            meta=item.doc,
+            collection=item.source.collection,
+            module_type=item.source.module_type,
+            uploader=self.uploader,
+        )
+        return None
+
+    # --- plumbing -----------------------------------------------------------
+
+    def _record(self, item, succeeded):
+        with self._lock:
+            self._outcomes.setdefault(item.source.name, {})[item.seq] = (
+                succeeded,
+                {"updatedAt": item.doc.get("updatedAt"), "_id": item.doc.get("_id")},
+            )
+        if not succeeded:
+            return
+        doc_id = str(item.doc.get("_id"))
+        if item.embedded:
+            self.telemetry.document_done(
+                item.source.name, doc_id, chunks=len(item.chunks), embedding_tokens=item.embedding_tokens
+            )
+        else:
+            self.telemetry.document_skipped(item.source.name, doc_id, reason="no text")
+
+    def _worker(self, index):
+        name, handler, _ = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            started = time.perf_counter()
+            try:
+                result = handler(item)
+            except Exception as e:
+                self.telemetry.add_time(item.source.name, name, time.perf_counter() - started)
+                self.telemetry.document_failed(item.source.name, str(item.doc.get("_id")), e, stage=name)
+                self._record(item, False)
+                continue
+            self.telemetry.add_time(item.source.name, name, time.perf_counter() - started)
+            if result is None or outbox is None:
+                # Finished: either skipped early or uploaded
+                self._record(item, True)
+            else:
+                outbox.put(result)
+
+    def run(self, sources, incremental=True):
+        """
+        Push every document of `sources` through the pipeline and wait for it to drain.
+
+        Returns:
+            {source name: {"documents": n, "failed": n, "fetch_failed": bool}}; throughput
+            and stage timings are in `self.telemetry`
+        """
+        # Collection versions are bumped and the local store saved once, after the run,
+        # rather than on every flush and prune
+        self.uploader = BatchUploader(mark_updated=False, persist=False)
+        threads = []
+        for index, (_, _, workers) in enumerate(self.stages):
+            stage_threads = [
+                threading.Thread(target=self._worker, args=(index,), daemon=True)
+                for _ in range(max(1, workers))
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        watermarks = {}
+        fetch_failed = set()
+        for source in sources:
+            since = None
+            if incremental and source.mongo_collection:
+                since = get_watermark(source.mongo_collection, source.collection)
+            watermarks[source.name] = since
+            self._outcomes.setdefault(source.name, {})
+            self.telemetry.start(source.name, module_type=source.module_type, since=since)
+            try:
+                for seq, doc in enumerate(source.fetch(since=since)):
+                    # Blocks while the extract queue is full
+                    self.queues[0].put(WorkItem(source=source, seq=seq, doc=doc))
+            except Exception as e:
+                self.telemetry.error(source.name, "fetch", e)
+                fetch_failed.add(source.name)
+
+        # Drain stage by stage: stop a stage only once everything upstream has finished
+        for index, stage_threads in enumerate(threads):
+            for _ in stage_threads:
+                self.queues[index].put(_STOP)
+            for thread in stage_threads:
+                thread.join()
+        # Points of successful documents may still be buffered; nothing counts as done until written
+        started = time.perf_counter()
+        self.uploader.close()
+        self.telemetry.add_time(None, "upload", time.perf_counter() - started)
+
+        updated = set(self.uploader.updated_collections)
+        # A partial fetch must not advance the watermark or prune live documents
+        finished = [source for source in sources if source.name not in fetch_failed]
+        for source in finished:
+            if self._prune(source):
+                updated.add(source.collection)
+        # Saved before any watermark moves past the documents it holds
+        persist_store()
+        for source in finished:
+            self._advance_watermark(source, self._outcomes.get(source.name, {}), watermarks[source.name])
+        summary = {}
+        for source in sources:
+            outcomes = self._outcomes.get(source.name, {})
+            summary[source.name] = {
+                "documents": len(outcomes),
+                "failed": sum(1 for succeeded, _ in outcomes.values() if not succeeded),
+                "fetch_failed": source.name in fetch_failed,
+            }
+        for collection in updated:
+            mark_collection_updated(collection)
+        return summary
+
+    def _advance_watermark(self, source, outcomes, since):
+        if not source.mongo_collection:
+            return
+        # Documents were fetched in (updatedAt, _id) order; advance only past the
+        # contiguous successes, so a failed document is fetched again next run
+        watermark = since
+        for seq in sorted(outcomes):
+            succeeded, position = outcomes[seq]
+            if not succeeded:
+                break
+            watermark = position
+        if watermark != since:
+            set_watermark(source.mongo_collection, source.collection, watermark)
+
+    def _prune(self, source):
+        """Delete the points of documents removed from `source`; returns whether any were."""
+        live_ids = source.live_source_ids()
+        if live_ids is None:
+            return False
+        return prune_deleted_documents(
+            source.collection, source.module_type, live_ids, mark=False, persist=False
+        ) > 0
+
+
+def run_pipeline(source_names=None, incremental=True, **pipeline_options):
+    """Run the named sources (all of them by default) through one shared pipeline."""
+    names = source_names or list(SOURCES)
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown sources: {', '.join(unknown)}. Choose from {', '.join(SOURCES)}.")
+    pipeline = IngestPipeline(**pipeline_options)
+    return pipeline.run([SOURCES[name] for name in names], incremental=incremental)
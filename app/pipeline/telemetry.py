@@ -0,0 +1,196 @@
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from app.config import INGEST_LOG_LEVEL, INGEST_PROGRESS_SECONDS
+
+log = logging.getLogger("app.ingest")
+if not log.handlers:
+    # One JSON object per line on stderr, whether or not the caller configured logging
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(INGEST_LOG_LEVEL)
+    log.propagate = False
+
+STAGES = ("parse", "chunk", "embed", "upload")
+
+
+def emit(event, level=logging.INFO, **fields):
+    """Log one structured event."""
+    if log.isEnabledFor(level):
+        record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "event": event}
+        record.update(fields)
+        log.log(level, json.dumps(record, default=str))
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 2) if seconds > 0 else 0.0
+
+
+class ModuleStats:
+    """Counters of one module (trainings, forms, ...) within a run."""
+
+    def __init__(self):
+        self.documents = 0
+        self.failed = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.embedding_tokens = 0
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.errors = {}
+        self.first_seen = None
+        self.last_seen = None
+
+    def touch(self, now):
+        if self.first_seen is None:
+            self.first_seen = now
+        self.last_seen = now
+
+    def as_dict(self, elapsed=None):
+        if elapsed is None:
+            elapsed = (self.last_seen - self.first_seen) if self.first_seen is not None else 0.0
+        return {
+            "documents": self.documents,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "chunks": self.chunks,
+            "embedding_tokens": self.embedding_tokens,
+            "seconds": round(elapsed, 3),
+            "documents_per_second": _rate(self.documents, elapsed),
+            "chunks_per_second": _rate(self.chunks, elapsed),
+            "embedding_tokens_per_second": _rate(self.embedding_tokens, elapsed),
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+            "errors": dict(self.errors),
+        }
+
+
+class IngestTelemetry:
+    """
+    Throughput, stage timings and errors of one ingestion run, by module.
+
+    Safe to share between the pipeline's worker threads. Emits a `progress`
+    event at most every `progress_seconds` and a `summary` event from finish().
+    """
+
+    def __init__(self, progress_seconds=INGEST_PROGRESS_SECONDS):
+        self.progress_seconds = progress_seconds
+        self.started = time.perf_counter()
+        self.modules = {}
+        # Work not attributable to one module, e.g. the final flush of a shared uploader
+        self.shared_seconds = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_progress = self.started
+
+    def _module(self, module):
+        stats = self.modules.get(module)
+        if stats is None:
+            stats = self.modules[module] = ModuleStats()
+        return stats
+
+    def start(self, module, **fields):
+        with self._lock:
+            self._module(module).touch(time.perf_counter())
+        emit("module_started", module=module, **fields)
+
+    def add_time(self, module, stage, seconds):
+        with self._lock:
+            if module is None:
+                self.shared_seconds[stage] = self.shared_seconds.get(stage, 0.0) + seconds
+                return
+            stats = self._module(module)
+            stats.stage_seconds[stage] = stats.stage_seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, module, stage):
+        """Time a block as `stage` of `module`; remembers the stage if the block raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._local.failed_stage = stage
+            raise
+        finally:
+            self.add_time(module, stage, time.perf_counter() - started)
+
+    def document_done(self, module, doc_id=None, chunks=0, embedding_tokens=0):
+        with self._lock:
+            stats = self._module(module)
+            stats.documents += 1
+            stats.chunks += chunks
+            stats.embedding_tokens += embedding_tokens
+            stats.touch(time.perf_counter())
+        emit("document", logging.DEBUG, module=module, id=doc_id, chunks=chunks, embedding_tokens=embedding_tokens)
+        self._maybe_report_progress()
+
+    def document_skipped(self, module, doc_id=None, reason=""):
+        with self._lock:
+            stats = self._module(module)
+            stats.documents += 1
+            stats.skipped += 1
+            stats.touch(time.perf_counter())
+        emit("document_skipped", module=module, id=doc_id, reason=reason)
+        self._maybe_report_progress()
+
+    def document_failed(self, module, doc_id, error, stage=None):
+        """Count a failed document; `stage` defaults to the stage that raised inside stage()."""
+        stage = stage or getattr(self._local, "failed_stage", None) or "unknown"
+        self._local.failed_stage = None
+        with self._lock:
+            stats = self._module(module)
+            stats.documents += 1
+            stats.failed += 1
+            stats.errors[stage] = stats.errors.get(stage, 0) + 1
+            stats.touch(time.perf_counter())
+        emit("document_failed", logging.WARNING, module=module, id=doc_id, stage=stage, error=str(error))
+        self._maybe_report_progress()
+
+    def error(self, module, stage, error, **fields):
+        """Count an error that is not tied to one document (e.g. a failed fetch)."""
+        with self._lock:
+            stats = self._module(module)
+            stats.errors[stage] = stats.errors.get(stage, 0) + 1
+        emit("error", logging.ERROR, module=module, stage=stage, error=str(error), **fields)
+
+    def _maybe_report_progress(self):
+        now = time.perf_counter()
+        with self._lock:
+            if now - self._last_progress < self.progress_seconds:
+                return
+            self._last_progress = now
+        emit("progress", **self._totals(now - self.started))
+
+    def _totals(self, elapsed):
+        with self._lock:
+            modules = list(self.modules.values())
+            totals = ModuleStats()
+            for stage, seconds in self.shared_seconds.items():
+                totals.stage_seconds[stage] = totals.stage_seconds.get(stage, 0.0) + seconds
+            for stats in modules:
+                totals.documents += stats.documents
+                totals.failed += stats.failed
+                totals.skipped += stats.skipped
+                totals.chunks += stats.chunks
+                totals.embedding_tokens += stats.embedding_tokens
+                for stage, seconds in stats.stage_seconds.items():
+                    totals.stage_seconds[stage] = totals.stage_seconds.get(stage, 0.0) + seconds
+                for stage, count in stats.errors.items():
+                    totals.errors[stage] = totals.errors.get(stage, 0) + count
+        return totals.as_dict(elapsed)
+
+    def summary(self):
+        """Machine-readable summary of the run so far."""
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            modules = {name: stats.as_dict() for name, stats in self.modules.items()}
+        return {"totals": self._totals(elapsed), "modules": modules}
+
+    def finish(self, **fields):
+        """Emit the end-of-run summary, with `fields` added, and return it."""
+        summary = dict(fields, **self.summary())
+        emit("summary", **summary)
+        return summary
@@ -1,28 +1,13 @@
-from app.db.mongo import db
-from bson import ObjectId
+from app.db.fetchers import fetch_documents_by_collection
 
 
-def fetch_all_tasks():
-    tasks_collection = db["tasks"]
-    documents = list(tasks_collection.find({"entityId": ObjectId("67e58254b40e27710ecc0ee3")}))
-    return documents
+def fetch_all_tasks(since=None):
+    return fetch_documents_by_collection("tasks", since=since)
 
 def fetch_tasks_by_status(status=None):
-    tasks_collection = db["tasks"]
-    query = {"entityId": ObjectId("67e58254b40e27710ecc0ee3")}
-    
-    if status:
-        query["status"] = status
-    
-    documents = list(tasks_collection.find(query))
-    return documents
+    filters = {"status": status} if status else None
+    return list(fetch_documents_by_collection("tasks", filters=filters))
 
 def fetch_tasks_by_type(task_type=None):
-    tasks_collection = db["tasks"]
-    query = {"entityId": ObjectId("67e58254b40e27710ecc0ee3")}
-    
-    if task_type:
-        query["taskType"] = task_type
-    
-    documents = list(tasks_collection.find(query))
-    return documents
\ No newline at end of file
+    filters = {"taskType": task_type} if task_type else None
+    return list(fetch_documents_by_collection("tasks", filters=filters))
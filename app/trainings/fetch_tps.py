@@ -1,8 +1,4 @@
-from app.db.mongo import db
-from bson import ObjectId
+from app.db.fetchers import fetch_documents_by_collection
 
-
-def fetch_all_trainings():
-    training_collection = db["tps"]
-    documents = list(training_collection.find({"entityId": ObjectId("67e58254b40e27710ecc0ee3")}))
-    return documents
\ No newline at end of file
+def fetch_all_trainings(since=None):
+    return fetch_documents_by_collection("tps", since=since)
\ No newline at end of file
@@ -1,70 +1,39 @@
 import os
-from app.trainings.fetch_tps import fetch_all_trainings
-from app.pdf.chunker import langchain_chunk
-from app.pdf.embedder import get_embedding
-from app.pdf.uploader import upload_to_qdrant
+from app.pipeline.telemetry import IngestTelemetry
 
+# Trainings are indexed into their own collection rather than QDRANT_COLLECTION
+TRAINING_COLLECTION = "delightree_prod"
 
-def process_all_trainings():
-    trainings = fetch_all_trainings()
-    print(f"Found {len(trainings)} trainings in DB.")
-    
-    for training in trainings:
-        training_id = str(training.get("_id"))
-        
-        try:
-            # Extract text from training content
-            title = training.get("title", "")
-            status = training.get("status", "")
-            description = training.get("description", "")
-            repeatCycle = training.get("repeatCycle", "")
 
-            # if not title:
-            #     print(f"❌ No title found for Training: {training_id}")
-                
-            # if not status: 
-            #     print(f"❌ No status found for Training: {training_id}")
-                
-            # if not description: 
-            #     print(f"❌ No description found for Training: {training_id}")
-                
-            # if not repeatCycle: 
-            #     print(f"❌ No repeatCycle found for Training: {training_id}")
-                
+def build_training_text(training):
+    """Flatten a training document into the text that gets chunked and embedded"""
+    # Extract text from training content
+    title = training.get("title", "")
+    status = training.get("status", "")
+    description = training.get("description", "")
+    repeatCycle = training.get("repeatCycle", "")
 
-                 # Build content sections
-            content_parts = []
-    
-            if title:
-                content_parts.append(f"Training Title: {title}")
-            if status:
-                content_parts.append(f"Status: {status}")
-            if description:
-                content_parts.append(f"Description: {description}")
-            if repeatCycle:
-                content_parts.append(f"Repeat Cycle: {repeatCycle}")
+    # Build content sections
+    content_parts = []
 
-            # if not content_parts:
-            #     print(f"❌ No content found for Training: {training_id}")
-                
-            
-            # Join all parts with double newlines for better separation
-            text = "\n\n".join(content_parts)
-            # Process the text
-            chunks = langchain_chunk(text)
-            print(f"📦 Chunked text into {len(chunks)} parts.")
-            
-            embedded = [(chunk, get_embedding(chunk)) for chunk in chunks]
-            
-            # Upload to Qdrant with updated signature
-            upload_to_qdrant(
-                chunks=embedded,
-                meta=training,  # Pass full training object
-                collection="delightree_prod",
-                module_type="training"
-            )
-            
-            print(f"✅ Uploaded {len(chunks)} chunks for Training {training_id}.")
-            
-        except Exception as e:
-            print(f"❌ Failed to process Training {training_id}: {e}")
\ No newline at end of file
+    if title:
+        content_parts.append(f"Training Title: {title}")
+    if status:
+        content_parts.append(f"Status: {status}")
+    if description:
+        content_parts.append(f"Description: {description}")
+    if repeatCycle:
+        content_parts.append(f"Repeat Cycle: {repeatCycle}")
+
+    # Join all parts with double newlines for better separation
+    return "\n\n".join(content_parts)
+
+
+def process_all_trainings(incremental=True):
+    """Ingest trainings on their own through the staged pipeline (see app.pipeline.runner)."""
+    # Imported here: the pipeline imports build_training_text from this module
+    from app.pipeline.runner import run_pipeline
+
+    telemetry = IngestTelemetry()
+    results = run_pipeline(["trainings"], incremental=incremental, telemetry=telemetry)
+    return telemetry.finish(module="trainings", sources=results)
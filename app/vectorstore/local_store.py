@@ -0,0 +1,409 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from qdrant_client.models import (
+    Filter,
+    FieldCondition,
+    MatchValue,
+    MatchAny,
+    MatchExcept,
+    HasIdCondition,
+    FilterSelector,
+    PointIdsList,
+    ScoredPoint,
+    Record,
+    UpdateResult,
+    UpdateStatus,
+)
+# qdrant_client.models.QueryResponse is fastembed's; query_points returns the HTTP model
+from qdrant_client.http.models import QueryResponse
+
+INT8_SCALE = 127.0
+
+
+class LocalCollection:
+    """
+    Vectors of one collection held in a contiguous NumPy array.
+
+    Vectors are L2-normalized on insert so cosine similarity is a single matrix
+    product. With dtype int8 they are additionally quantized to [-127, 127],
+    which cuts memory 4x at a small cost in score precision.
+    """
+
+    def __init__(self, vector_size, dtype="float32"):
+        self.vector_size = vector_size
+        self.dtype = np.int8 if dtype == "int8" else np.float32
+        self.vectors = np.zeros((0, vector_size), dtype=self.dtype)
+        self.alive = np.zeros(0, dtype=bool)
+        self.ids = []
+        self.payloads = []
+        self.slots = {}  # point id -> row
+        self.count = 0  # rows in use (alive or not)
+        self.field_indexes = {}  # payload key -> {value: rows}, built on demand
+
+    # --- storage ------------------------------------------------------------
+
+    def _encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.vector_size)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        if self.dtype == np.int8:
+            return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+        return vectors
+
+    def _decode(self, rows):
+        if self.dtype == np.int8:
+            return rows.astype(np.float32) / INT8_SCALE
+        return rows
+
+    def _reserve(self, extra):
+        needed = self.count + extra
+        capacity = self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        vectors = np.zeros((new_capacity, self.vector_size), dtype=self.dtype)
+        vectors[:self.count] = self.vectors[:self.count]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self.count] = self.alive[:self.count]
+        self.vectors, self.alive = vectors, alive
+
+    def upsert(self, points):
+        points = list(points)
+        if not points:
+            return
+        encoded = self._encode([point.vector for point in points])
+        self._reserve(len(points))
+        for point, vector in zip(points, encoded):
+            key = str(point.id)
+            row = self.slots.get(key)
+            if row is None:
+                row = self.count
+                self.count += 1
+                self.slots[key] = row
+                self.ids.append(point.id)
+                self.payloads.append(point.payload or {})
+            else:
+                self.payloads[row] = point.payload or {}
+            self.vectors[row] = vector
+            self.alive[row] = True
+        # Payloads changed; field indexes are rebuilt on the next filtered query
+        self.field_indexes = {}
+
+    def delete_rows(self, rows):
+        for row in rows:
+            if self.alive[row]:
+                self.alive[row] = False
+                self.slots.pop(str(self.ids[row]), None)
+
+    def live_rows(self):
+        return np.flatnonzero(self.alive[:self.count])
+
+    # --- filtering ----------------------------------------------------------
+
+    def _field_index(self, key):
+        """{payload value: rows holding it} for one payload key; missing keys index as None."""
+        index = self.field_indexes.get(key)
+        if index is None:
+            grouped = {}
+            for row, payload in enumerate(self.payloads[:self.count]):
+                value = payload.get(key)
+                for item in (value if isinstance(value, list) else [value]):
+                    try:
+                        grouped.setdefault(item, []).append(row)
+                    except TypeError:  # unhashable payload value; can't be matched on
+                        continue
+            index = self.field_indexes[key] = {
+                value: np.asarray(rows, dtype=np.int64) for value, rows in grouped.items()
+            }
+        return index
+
+    def _rows_mask(self, rows):
+        mask = np.zeros(self.count, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def _values_mask(self, key, values):
+        index = self._field_index(key)
+        mask = np.zeros(self.count, dtype=bool)
+        for value in values:
+            rows = index.get(value)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def _condition_mask(self, condition):
+        if isinstance(condition, Filter):
+            return self.filter_mask(condition)
+        if isinstance(condition, HasIdCondition):
+            rows = [self.slots[str(i)] for i in condition.has_id if str(i) in self.slots]
+            return self._rows_mask(rows)
+        if isinstance(condition, FieldCondition):
+            match = condition.match
+            if isinstance(match, MatchValue):
+                return self._values_mask(condition.key, [match.value])
+            if isinstance(match, MatchAny):
+                return self._values_mask(condition.key, match.any)
+            if isinstance(match, MatchExcept):
+                return ~self._values_mask(condition.key, getattr(match, "except_"))
+            raise ValueError(f"Unsupported match in local vector store: {condition!r}")
+        raise ValueError(f"Unsupported condition in local vector store: {condition!r}")
+
+    def filter_mask(self, query_filter):
+        """Boolean mask over rows [0, count) of the points matching `query_filter` (dead rows included)."""
+        mask = np.ones(self.count, dtype=bool)
+        if query_filter is None:
+            return mask
+        for condition in query_filter.must or []:
+            mask &= self._condition_mask(condition)
+        for condition in query_filter.must_not or []:
+            mask &= ~self._condition_mask(condition)
+        if query_filter.should:
+            any_mask = np.zeros(self.count, dtype=bool)
+            for condition in query_filter.should:
+                any_mask |= self._condition_mask(condition)
+            mask &= any_mask
+        return mask
+
+    def matching_rows(self, query_filter):
+        if query_filter is None:
+            return self.live_rows()
+        return np.flatnonzero(self.filter_mask(query_filter) & self.alive[:self.count])
+
+    # --- search -------------------------------------------------------------
+
+    def _scores(self, query):
+        """Cosine score of every row in [0, count), without copying the matrix for float32."""
+        vectors = self.vectors[:self.count]
+        if self.dtype != np.int8:
+            return vectors @ query
+        # int8 rows are upcast block by block to bound the temporary
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, 65536):
+            block = vectors[start:start + 65536].astype(np.float32)
+            scores[start:start + 65536] = block @ query
+        return scores / INT8_SCALE
+
+    def search(self, query_vector, limit, query_filter=None, with_vectors=False, score_threshold=None):
+        mask = self.alive[:self.count]
+        if query_filter is not None:
+            mask = mask & self.filter_mask(query_filter)
+        matching = int(mask.sum())
+        if matching == 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+        scores = np.where(mask, self._scores(query), -np.inf)
+        limit = min(limit, matching)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for row in top:
+            score = float(scores[row])
+            if score_threshold is not None and score < score_threshold:
+                break
+            hits.append(
+                ScoredPoint(
+                    id=self.ids[row],
+                    version=0,
+                    score=score,
+                    payload=self.payloads[row],
+                    vector=self._decode(self.vectors[row]).tolist() if with_vectors else None,
+                )
+            )
+        return hits
+
+    # --- persistence --------------------------------------------------------
+
+    def save(self, directory):
+        """
+        Write the live points to `directory` and compact this collection to match.
+
+        The vectors go to a temporary file that replaces vectors.npy, so a memory
+        map of the previous file stays valid until it is swapped for the new one.
+        """
+        os.makedirs(directory, exist_ok=True)
+        rows = self.live_rows()
+        path = os.path.join(directory, "vectors.npy")
+        temporary = os.path.join(directory, "vectors.tmp.npy")
+        np.save(temporary, np.ascontiguousarray(self.vectors[rows]))
+        os.replace(temporary, path)
+        ids = [self.ids[row] for row in rows]
+        payloads = [self.payloads[row] for row in rows]
+        with open(os.path.join(directory, "points.jsonl"), "w", encoding="utf-8") as f:
+            for point_id, payload in zip(ids, payloads):
+                f.write(json.dumps({"id": point_id, "payload": payload}, default=str) + "\n")
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"vector_size": self.vector_size, "dtype": np.dtype(self.dtype).name}, f)
+        # Row numbers now refer to the compacted file
+        self._set_rows(np.load(path, mmap_mode="c"), ids, payloads)
+
+    def _set_rows(self, vectors, ids, payloads):
+        self.vectors = vectors
+        self.ids = ids
+        self.payloads = payloads
+        self.slots = {str(point_id): row for row, point_id in enumerate(ids)}
+        self.count = len(ids)
+        self.alive = np.ones(self.count, dtype=bool)
+        self.field_indexes = {}
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        collection = cls(meta["vector_size"], meta["dtype"])
+        ids, payloads = [], []
+        with open(os.path.join(directory, "points.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record["id"])
+                payloads.append(record["payload"])
+        # Copy-on-write memory map: pages are read lazily, writes never touch the file
+        collection._set_rows(np.load(os.path.join(directory, "vectors.npy"), mmap_mode="c"), ids, payloads)
+        return collection
+
+
+class LocalVectorStore:
+    """
+    In-process stand-in for the subset of QdrantClient this service uses.
+
+    Supports get/create/delete collection, upsert, delete by IDs or filter,
+    retrieve, scroll and filtered top-k cosine search. Collections are saved to and
+    loaded from `path` (one directory per collection) when a path is given; persist()
+    rewrites only the collections changed since the last save.
+    """
+
+    def __init__(self, path=None, dtype="float32"):
+        self.path = path
+        self.dtype = dtype
+        self.collections = {}
+        self._dirty = set()  # collections changed since they were last saved
+        self._lock = threading.RLock()
+        if path and os.path.isdir(path):
+            for name in os.listdir(path):
+                if os.path.exists(os.path.join(path, name, "meta.json")):
+                    self.collections[name] = LocalCollection.load(os.path.join(path, name))
+
+    def _collection(self, name):
+        if name not in self.collections:
+            raise ValueError(f"Collection {name} not found")
+        return self.collections[name]
+
+    def get_collection(self, collection_name):
+        collection = self._collection(collection_name)
+        return {"vector_size": collection.vector_size, "points_count": int(collection.live_rows().size)}
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        with self._lock:
+            self.collections[collection_name] = LocalCollection(vectors_config.size, self.dtype)
+            self._dirty.add(collection_name)
+        return True
+
+    def delete_collection(self, collection_name, **kwargs):
+        with self._lock:
+            self._collection(collection_name)
+            del self.collections[collection_name]
+            self._dirty.discard(collection_name)
+            if self.path:
+                # Otherwise the collection would be loaded again on the next start
+                shutil.rmtree(os.path.join(self.path, collection_name), ignore_errors=True)
+        return True
+
+    def create_payload_index(self, collection_name, field_name, field_schema=None, **kwargs):
+        # Field indexes are built on demand for every filtered key
+        return True
+
+    def upsert(self, collection_name, points, wait=True, **kwargs):
+        with self._lock:
+            self._collection(collection_name).upsert(points)
+            self._dirty.add(collection_name)
+        return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+    def delete(self, collection_name, points_selector, wait=True, **kwargs):
+        with self._lock:
+            collection = self._collection(collection_name)
+            if isinstance(points_selector, PointIdsList):
+                wanted = {str(i) for i in points_selector.points}
+                rows = [collection.slots[i] for i in wanted if i in collection.slots]
+            elif isinstance(points_selector, FilterSelector):
+                rows = collection.matching_rows(points_selector.filter)
+            else:
+                rows = collection.matching_rows(points_selector)
+            collection.delete_rows(rows)
+            self._dirty.add(collection_name)
+        return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+    def scroll(self, collection_name, scroll_filter=None, limit=10, offset=None,
+               with_payload=True, with_vectors=False, **kwargs):
+        with self._lock:
+            collection = self._collection(collection_name)
+            rows = collection.matching_rows(scroll_filter)
+            start = int(offset or 0)
+            page = rows[start:start + limit]
+            records = []
+            for row in page:
+                payload = collection.payloads[row]
+                if isinstance(with_payload, list):
+                    payload = {key: payload[key] for key in with_payload if key in payload}
+                elif not with_payload:
+                    payload = None
+                vector = collection._decode(collection.vectors[row]).tolist() if with_vectors else None
+                records.append(Record(id=collection.ids[row], payload=payload, vector=vector))
+            next_offset = start + limit if start + limit < rows.size else None
+        return records, next_offset
+
+    def retrieve(self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs):
+        with self._lock:
+            collection = self._collection(collection_name)
+            records = []
+            for point_id in ids:
+                row = collection.slots.get(str(point_id))
+                if row is None:
+                    continue
+                records.append(
+                    Record(
+                        id=collection.ids[row],
+                        payload=collection.payloads[row] if with_payload else None,
+                        vector=collection._decode(collection.vectors[row]).tolist() if with_vectors else None,
+                    )
+                )
+        return records
+
+    def query_points(self, collection_name, query, limit=10, query_filter=None,
+                     with_vectors=False, score_threshold=None, **kwargs):
+        """Nearest-vector query; `query` must be a dense vector."""
+        with self._lock:
+            collection = self._collection(collection_name)
+            points = collection.search(
+                query, limit, query_filter=query_filter,
+                with_vectors=with_vectors, score_threshold=score_threshold,
+            )
+        return QueryResponse(points=points)
+
+    def persist(self):
+        """Write the collections changed since the last save to `path`."""
+        if not self.path:
+            return
+        with self._lock:
+            for name in sorted(self._dirty):
+                self.collections[name].save(os.path.join(self.path, name))
+            self._dirty.clear()
+
+
+class AsyncLocalVectorStore:
+    """Async facade over a LocalVectorStore, mirroring AsyncQdrantClient."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
@@ -0,0 +1,122 @@
+"""
+Synthetic, seeded documents for the Mongo-backed sources, shaped like the
+production collections (see MODULE_PROJECTIONS in app/db/fetchers.py).
+"""
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.db.fetchers import ENTITY_ID
+
+VOCABULARY = (
+    "training location launcher audit checklist form task chapter knowledge base franchisee "
+    "manager shift opening closing inventory food safety temperature cleaning schedule visibility "
+    "permission chat notification onboarding employee store compliance inspection report photo "
+    "signature deadline recurring weekly daily monthly assign complete review approve upload "
+    "document procedure standard operating menu recipe allergen equipment maintenance customer"
+).split()
+
+QUESTIONS = [
+    "How do I set up a training for new employees?",
+    "How can I make a new location active on launcher?",
+    "What is the food safety checklist for opening shift?",
+    "How do I assign a recurring weekly task to a store manager?",
+    "Where can I review completed audit reports?",
+    "How do I set chat permissions for franchisees?",
+    "How do I upload a standard operating procedure document?",
+    "What is the cleaning schedule for closing?",
+    "How do I set visibility on a knowledge base chapter?",
+    "Which form is used for temperature inspections?",
+]
+
+# Mongo collection -> module type, as ingested by app/pipeline/runner.py
+COLLECTIONS = {"tps": "training", "forms": "form", "tasks": "task", "audits": "audit", "sops": "sop"}
+
+
+def words(rng, low, high):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(low, high)))
+
+
+def paragraphs(rng, count, low=40, high=160):
+    return "\n\n".join(words(rng, low, high).capitalize() + "." for _ in range(count))
+
+
+def base_document(rng, index, collection, started):
+    updated = started + timedelta(minutes=index)
+    return {
+        "_id": ObjectId(),
+        "entityId": ENTITY_ID,
+        "title": words(rng, 3, 8).title(),
+        "url": f"https://app.example.com/{collection}/{index}",
+        "createdAt": updated - timedelta(days=rng.randint(0, 365)),
+        "updatedAt": updated,
+    }
+
+
+def make_document(rng, index, collection, started, pdf_urls):
+    doc = base_document(rng, index, collection, started)
+    status = rng.choice(["active", "draft", "archived"])
+    cycle = rng.choice(["daily", "weekly", "monthly", ""])
+    if collection == "tps":
+        doc.update(status=status, description=paragraphs(rng, rng.randint(1, 4)), repeatCycle=cycle)
+    elif collection == "forms":
+        doc.update(
+            category=rng.choice(["inspection", "onboarding", "feedback"]),
+            status=status,
+            visibility=rng.choice(["public", "private"]),
+            formType=rng.choice(["survey", "checklist"]),
+        )
+    elif collection == "tasks":
+        doc.update(
+            status=status,
+            description=paragraphs(rng, rng.randint(1, 3)),
+            repeatCycle=cycle,
+            taskType=rng.choice(["recurring", "one-off"]),
+        )
+    elif collection == "audits":
+        doc.update(status=status, repeatCycle=cycle, auditType=rng.choice(["store", "food-safety"]))
+    elif collection == "sops":
+        if pdf_urls:
+            doc.update(sopType="document", files=[{"url": pdf_urls[index % len(pdf_urls)]}])
+        else:
+            doc.update(sopType="text", raw_content=paragraphs(rng, rng.randint(3, 12)))
+    return doc
+
+
+def make_pdf(rng, pages):
+    """A text-layer PDF; parsing it exercises PyMuPDF but not OCR."""
+    import fitz
+
+    pdf = fitz.open()
+    for _ in range(pages):
+        page = pdf.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), paragraphs(rng, 4, 30, 80), fontsize=9)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def seed(db, documents_per_source=50, pdf_share=0.5, pdf_pages=4, seed_value=0):
+    """
+    Insert synthetic documents for every Mongo-backed source.
+
+    Args:
+        db: Database to fill (the fake Mongo's `db`)
+        documents_per_source: Documents per collection
+        pdf_share: Fraction of SOPs that are PDF documents rather than text
+        pdf_pages: Pages per generated PDF
+
+    Returns:
+        {url: pdf bytes} for the document SOPs, to be served by a fake downloader
+    """
+    rng = random.Random(seed_value)
+    started = datetime(2025, 1, 1)
+    pdf_count = round(documents_per_source * pdf_share)
+    pdfs = {f"https://files.example.com/sops/{i}.pdf": make_pdf(rng, pdf_pages) for i in range(pdf_count)}
+    pdf_urls = list(pdfs)
+    for collection in COLLECTIONS:
+        for index in range(documents_per_source):
+            urls = pdf_urls if collection == "sops" and index < pdf_count else None
+            db[collection].insert_one(make_document(rng, index, collection, started, urls))
+    return pdfs
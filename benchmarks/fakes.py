@@ -0,0 +1,686 @@
+"""
+In-process stand-ins for OpenAI and Mongo used by the benchmarks.
+
+They implement only the calls this service makes, with deterministic results
+and configurable latency, so benchmark numbers reflect our own code plus a
+known, fixed amount of simulated network time.
+"""
+import asyncio
+import copy
+import hashlib
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from types import SimpleNamespace
+
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=100_000)
+def _tokens(text):
+    return tuple(_WORD.findall(text.lower()))
+
+
+def tokenize(text):
+    return _tokens(text or "")
+
+
+# --- OpenAI -----------------------------------------------------------------
+
+@lru_cache(maxsize=50_000)
+def _word_vector(word, dimensions):
+    seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+def fake_embedding(text, dimensions=384):
+    """
+    Deterministic bag-of-words embedding: texts sharing words point the same way,
+    so retrieval over fake embeddings still returns plausible neighbours.
+    """
+    words = tokenize(text) or [text or ""]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in words:
+        vector += _word_vector(word, dimensions)
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return (vector / norm).tolist()
+
+
+class FakeOpenAIBehaviour:
+    """
+    Latency model shared by the sync and async fakes.
+
+    Args:
+        embed_latency: Seconds per embeddings request
+        chat_latency: Seconds until the first completion token
+        token_latency: Seconds between completion tokens
+        answer_tokens: Tokens in every completion
+    """
+
+    def __init__(self, embed_latency=0.0, chat_latency=0.0, token_latency=0.0, answer_tokens=64):
+        self.embed_latency = embed_latency
+        self.chat_latency = chat_latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+        self.calls = {"embeddings": 0, "embedded_inputs": 0, "chat": 0}
+        self._lock = threading.Lock()
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.calls[key] += amount
+
+    def embeddings_response(self, input, dimensions=None, **kwargs):
+        inputs = [input] if isinstance(input, str) else list(input)
+        self.count("embeddings")
+        self.count("embedded_inputs", len(inputs))
+        data = [
+            SimpleNamespace(index=i, embedding=fake_embedding(text, dimensions or 1536), object="embedding")
+            for i, text in enumerate(inputs)
+        ]
+        tokens = sum(len(tokenize(text)) for text in inputs)
+        return SimpleNamespace(data=data, usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens))
+
+    def answer_parts(self):
+        return [f"word{i % 97} " for i in range(self.answer_tokens)]
+
+    def chat_seconds(self):
+        return self.chat_latency + self.token_latency * max(0, self.answer_tokens - 1)
+
+    def usage(self, messages):
+        prompt_tokens = sum(len(tokenize(message.get("content", ""))) for message in messages or [])
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=self.answer_tokens,
+            total_tokens=prompt_tokens + self.answer_tokens,
+        )
+
+    def chat_response(self, messages):
+        self.count("chat")
+        message = SimpleNamespace(role="assistant", content="".join(self.answer_parts()))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=self.usage(messages),
+        )
+
+
+def _stream_chunk(content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=content))], usage=None
+    )
+
+
+class _SyncEmbeddings:
+    def __init__(self, behaviour):
+        self._behaviour = behaviour
+
+    def create(self, input, model=None, dimensions=None, **kwargs):
+        time.sleep(self._behaviour.embed_latency)
+        return self._behaviour.embeddings_response(input, dimensions)
+
+
+class _SyncCompletions:
+    def __init__(self, behaviour):
+        self._behaviour = behaviour
+
+    def create(self, model=None, messages=None, stream=False, **kwargs):
+        if stream:
+            raise NotImplementedError("The sync fake does not stream; the service only streams asynchronously.")
+        time.sleep(self._behaviour.chat_seconds())
+        return self._behaviour.chat_response(messages)
+
+
+class _AsyncEmbeddings:
+    def __init__(self, behaviour):
+        self._behaviour = behaviour
+
+    async def create(self, input, model=None, dimensions=None, **kwargs):
+        await asyncio.sleep(self._behaviour.embed_latency)
+        return self._behaviour.embeddings_response(input, dimensions)
+
+
+class _AsyncCompletions:
+    def __init__(self, behaviour):
+        self._behaviour = behaviour
+
+    async def create(self, model=None, messages=None, stream=False, stream_options=None, **kwargs):
+        behaviour = self._behaviour
+        if not stream:
+            await asyncio.sleep(behaviour.chat_seconds())
+            return behaviour.chat_response(messages)
+        behaviour.count("chat")
+
+        async def chunks():
+            for i, part in enumerate(behaviour.answer_parts()):
+                await asyncio.sleep(behaviour.chat_latency if i == 0 else behaviour.token_latency)
+                yield _stream_chunk(part)
+            if (stream_options or {}).get("include_usage"):
+                yield SimpleNamespace(choices=[], usage=behaviour.usage(messages))
+
+        return chunks()
+
+
+class FakeOpenAI:
+    """Stand-in for `openai.OpenAI`."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.embeddings = _SyncEmbeddings(behaviour)
+        self.chat = SimpleNamespace(completions=_SyncCompletions(behaviour))
+
+
+class FakeAsyncOpenAI:
+    """Stand-in for `openai.AsyncOpenAI`."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.embeddings = _AsyncEmbeddings(behaviour)
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(behaviour))
+
+
+# --- Mongo ------------------------------------------------------------------
+
+def _get_path(doc, path):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _compare(value, op, operand):
+    if op == "$in":
+        if isinstance(value, list):
+            return any(item in operand for item in value)
+        return value in operand
+    if op == "$nin":
+        return not _compare(value, "$in", operand)
+    if op == "$ne":
+        return value != operand
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        if value is None:
+            return False
+        try:
+            return {
+                "$gt": value > operand,
+                "$gte": value >= operand,
+                "$lt": value < operand,
+                "$lte": value <= operand,
+            }[op]
+        except TypeError:
+            return False
+    raise NotImplementedError(f"Query operator {op} is not supported by the fake Mongo.")
+
+
+def matches(doc, query):
+    """Evaluate the subset of the Mongo query language this service uses."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif key == "$text":
+            continue  # scored separately; see text_score
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            value = _get_path(doc, key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        else:
+            value = _get_path(doc, key)
+            if value != condition and not (isinstance(value, list) and condition in value):
+                return False
+    return True
+
+
+def text_score(doc, search, weights=None):
+    """Crude stand-in for a `$text` score: weighted count of query terms."""
+    terms = set(tokenize(search))
+    weights = weights or {"title": 3, "text": 1}
+    score = 0.0
+    for field, weight in weights.items():
+        words = tokenize(str(_get_path(doc, field) or ""))
+        score += weight * sum(1 for word in words if word in terms)
+    return score
+
+
+def _project(doc, projection, score=None):
+    if not projection:
+        result = dict(doc)
+    else:
+        if isinstance(projection, (list, tuple)):
+            projection = {field: 1 for field in projection}
+        included = [field for field, flag in projection.items() if flag and not isinstance(flag, dict)]
+        excluded = [field for field, flag in projection.items() if not flag and field != "_id"]
+        if included:
+            result = {field: doc[field] for field in included if field in doc}
+            result["_id"] = doc.get("_id")
+        else:
+            result = {field: value for field, value in doc.items() if field not in excluded}
+        if projection.get("_id", 1) == 0:
+            result.pop("_id", None)
+        for field, flag in projection.items():
+            if isinstance(flag, dict) and flag.get("$meta") == "textScore":
+                result[field] = score
+    return copy.deepcopy(result)
+
+
+def _sort_key(value):
+    # None sorts first, like in Mongo; mixed types fall back to their string form
+    return (value is not None, value if isinstance(value, (int, float, datetime)) else str(value))
+
+
+class FakeCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=1):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def close(self):
+        pass
+
+    def _results(self):
+        search = (self._query.get("$text") or {}).get("$search")
+        scored = []
+        for doc in self._collection.snapshot():
+            if not matches(doc, self._query):
+                continue
+            score = text_score(doc, search) if search else None
+            if search and not score:
+                continue
+            scored.append((doc, score))
+        for field, direction in reversed(self._sort):
+            if isinstance(direction, dict):  # {"$meta": "textScore"}: best first
+                scored.sort(key=lambda item: item[1] or 0.0, reverse=True)
+            else:
+                scored.sort(key=lambda item: _sort_key(_get_path(item[0], field)), reverse=direction == -1)
+        scored = scored[self._skip:]
+        if self._limit:
+            scored = scored[: self._limit]
+        return [_project(doc, self._projection, score) for doc, score in scored]
+
+    def __iter__(self):
+        return iter(self._results())
+
+
+def _expression(doc, value):
+    """A `"$field.path"` reference or a literal, as aggregation stages read them."""
+    if isinstance(value, str) and value.startswith("$"):
+        return _get_path(doc, value[1:])
+    return value
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = _expression(doc, spec["_id"])
+        group = groups.get(key)
+        first = group is None
+        if first:
+            group = groups[key] = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, operand), = accumulator.items()
+            value = _expression(doc, operand)
+            if op == "$sum":
+                group[field] = group.get(field, 0) + (value or 0)
+            elif op == "$first":
+                if first:
+                    group[field] = value
+            elif op == "$last":
+                group[field] = value
+            elif op in ("$min", "$max"):
+                current = group.get(field)
+                if current is None or (value is not None and (value < current if op == "$min" else value > current)):
+                    group[field] = value
+            else:
+                raise NotImplementedError(f"Accumulator {op} is not supported by the fake Mongo.")
+    return list(groups.values())
+
+
+def _project_stage(doc, spec):
+    if all(not flag for field, flag in spec.items() if field != "_id"):
+        return _project(doc, spec)
+    result = {} if spec.get("_id", 1) == 0 else {"_id": doc.get("_id")}
+    for field, value in spec.items():
+        if field == "_id":
+            continue
+        if isinstance(value, str):
+            result[field] = copy.deepcopy(_expression(doc, value))
+        elif field in doc:
+            result[field] = copy.deepcopy(doc[field])
+    return result
+
+
+def aggregate(docs, pipeline, database):
+    """
+    Run the aggregation stages this service uses over `docs`.
+
+    `$merge` writes into `database(name)` and, as in Mongo, returns nothing.
+    """
+    docs = [copy.deepcopy(doc) for doc in docs]
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif op == "$sort":
+            for field, direction in reversed(list(spec.items())):
+                docs.sort(key=lambda doc: _sort_key(_get_path(doc, field)), reverse=direction == -1)
+        elif op == "$limit":
+            docs = docs[:spec]
+        elif op == "$project":
+            docs = [_project_stage(doc, spec) for doc in docs]
+        elif op == "$group":
+            docs = _group(docs, spec)
+        elif op == "$merge":
+            target = database(spec["into"])
+            for doc in docs:
+                fields = {field: value for field, value in doc.items() if field != "_id"}
+                target.update_one({"_id": doc["_id"]}, {"$set": fields}, upsert=True)
+            docs = []
+        else:
+            raise NotImplementedError(f"Aggregation stage {op} is not supported by the fake Mongo.")
+    return docs
+
+
+class FakeAggregateCursor:
+    """The results of an aggregation, iterable like pymongo's CommandCursor."""
+
+    def __init__(self, docs):
+        self._docs = docs
+
+    def _results(self):
+        return list(self._docs)
+
+    def __iter__(self):
+        return iter(self._results())
+
+
+def _apply_update(doc, update, inserting):
+    for op, fields in update.items():
+        for field, value in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                doc[field] = value
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$unset":
+                doc.pop(field, None)
+            elif op == "$inc":
+                doc[field] = doc.get(field, 0) + value
+            elif op == "$max":
+                if doc.get(field) is None or value > doc[field]:
+                    doc[field] = value
+            elif op == "$min":
+                if doc.get(field) is None or value < doc[field]:
+                    doc[field] = value
+            elif op == "$currentDate":
+                doc[field] = datetime.utcnow()
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by the fake Mongo.")
+
+
+class FakeCollection:
+    """Thread-safe in-memory collection with the pymongo calls this service makes."""
+
+    def __init__(self, name, database=None):
+        self.name = name
+        # name -> FakeCollection on the same server, for $merge
+        self._database = database
+        self._docs = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._docs.values())
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(self, query, projection)
+
+    def find_one(self, query=None, projection=None):
+        for doc in self.find(query, projection).limit(1):
+            return doc
+        return None
+
+    def count_documents(self, query):
+        return sum(1 for doc in self.snapshot() if matches(doc, query))
+
+    def insert_one(self, doc):
+        # pymongo sets the generated _id on the caller's document
+        doc.setdefault("_id", ObjectId())
+        with self._lock:
+            self._docs[doc["_id"]] = copy.deepcopy(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    def insert_many(self, docs):
+        return SimpleNamespace(inserted_ids=[self.insert_one(doc).inserted_id for doc in docs])
+
+    def update_one(self, filter, update, upsert=False):
+        with self._lock:
+            for doc in self._docs.values():
+                if matches(doc, filter):
+                    _apply_update(doc, update, inserting=False)
+                    return SimpleNamespace(matched_count=1, upserted_id=None)
+            if not upsert:
+                return SimpleNamespace(matched_count=0, upserted_id=None)
+            doc = {key: value for key, value in filter.items() if not key.startswith("$") and not isinstance(value, dict)}
+            doc.setdefault("_id", ObjectId())
+            if doc["_id"] in self._docs:
+                # The filter didn't match the document that has this _id
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}")
+            _apply_update(doc, update, inserting=True)
+            self._docs[doc["_id"]] = doc
+            return SimpleNamespace(matched_count=0, upserted_id=doc["_id"])
+
+    def replace_one(self, filter, replacement, upsert=False):
+        with self._lock:
+            for key, doc in self._docs.items():
+                if matches(doc, filter):
+                    self._docs[key] = dict(replacement, _id=key)
+                    return SimpleNamespace(matched_count=1, upserted_id=None)
+        if upsert:
+            return SimpleNamespace(matched_count=0, upserted_id=self.insert_one(dict(replacement)).inserted_id)
+        return SimpleNamespace(matched_count=0, upserted_id=None)
+
+    def delete_one(self, query):
+        with self._lock:
+            for key, doc in self._docs.items():
+                if matches(doc, query):
+                    del self._docs[key]
+                    return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    def delete_many(self, query):
+        with self._lock:
+            doomed = [key for key, doc in self._docs.items() if matches(doc, query)]
+            for key in doomed:
+                del self._docs[key]
+        return SimpleNamespace(deleted_count=len(doomed))
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            # pymongo's UpdateOne/ReplaceOne keep their arguments in these attributes
+            name = type(operation).__name__
+            if name == "UpdateOne":
+                self.update_one(operation._filter, operation._doc, upsert=bool(operation._upsert))
+            elif name == "ReplaceOne":
+                self.replace_one(operation._filter, operation._doc, upsert=bool(operation._upsert))
+            elif name == "DeleteMany":
+                self.delete_many(operation._filter)
+            else:
+                raise NotImplementedError(f"{name} is not supported by the fake Mongo.")
+        return SimpleNamespace(acknowledged=True)
+
+    def create_index(self, keys, **kwargs):
+        return "fake_index"
+
+    def aggregate(self, pipeline, **kwargs):
+        return FakeAggregateCursor(aggregate(self.snapshot(), pipeline, self._database))
+
+
+class FakeAsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length=None):
+        results = self._cursor._results()
+        return results[:length] if length else results
+
+    async def __aiter__(self):
+        for doc in self._cursor._results():
+            yield doc
+
+
+class FakeAsyncCollection:
+    """motor-style wrapper over the same storage as the sync collection."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, query=None, projection=None):
+        return FakeAsyncCursor(self._collection.find(query, projection))
+
+    async def find_one(self, query=None, projection=None):
+        return self._collection.find_one(query, projection)
+
+    async def insert_one(self, doc):
+        return self._collection.insert_one(doc)
+
+    async def update_one(self, filter, update, upsert=False):
+        return self._collection.update_one(filter, update, upsert=upsert)
+
+    async def delete_one(self, query):
+        return self._collection.delete_one(query)
+
+    async def delete_many(self, query):
+        return self._collection.delete_many(query)
+
+    async def count_documents(self, query):
+        return self._collection.count_documents(query)
+
+    def aggregate(self, pipeline, **kwargs):
+        # motor returns the cursor straight away and runs the pipeline on to_list()
+        return FakeAsyncCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    async def create_index(self, keys, **kwargs):
+        return self._collection.create_index(keys, **kwargs)
+
+
+class FakeMongo:
+    """One in-memory server, exposed as a pymongo database (`db`) and a motor one (`async_db`)."""
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+        self.db = _FakeDatabase(self._collection)
+        self.async_db = _FakeDatabase(lambda name: FakeAsyncCollection(self._collection(name)))
+
+    def _collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(name, self._collection)
+            return self._collections[name]
+
+
+class _FakeDatabase:
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getitem__(self, name):
+        return self._factory(name)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._factory(name)
+
+
+# --- wiring -----------------------------------------------------------------
+
+def replace_everywhere(original, replacement, package="app"):
+    """
+    Point every module-level reference to `original` inside `package` at `replacement`.
+
+    The service binds its clients at import time (`from app.db.mongo import db`),
+    so patching only the defining module would miss the copies.
+
+    Returns:
+        Number of references replaced
+    """
+    replaced = 0
+    for name, module in list(sys.modules.items()):
+        if module is None or not (name == package or name.startswith(package + ".")):
+            continue
+        for attr, value in list(vars(module).items()):
+            if value is original:
+                setattr(module, attr, replacement)
+                replaced += 1
+    return replaced
+
+
+def install(behaviour, mongo, download=None):
+    """
+    Swap the service's OpenAI and Mongo clients (and optionally the PDF
+    downloader) for the fakes. Import every app module that should see them
+    before calling this.
+    """
+    from app.db import mongo as mongo_module
+    from app.pdf import embedder
+    from app.pdf.embedding_backends import OpenAIEmbeddingBackend
+
+    # A local backend (EMBEDDING_BACKEND=local) is benchmarked as is
+    if isinstance(embedder.get_backend(), OpenAIEmbeddingBackend):
+        embedder.set_backend(
+            OpenAIEmbeddingBackend(client=FakeOpenAI(behaviour), async_client=FakeAsyncOpenAI(behaviour))
+        )
+    if "app.api.query" in sys.modules:
+        replace_everywhere(sys.modules["app.api.query"].openai_client, FakeAsyncOpenAI(behaviour))
+    replace_everywhere(mongo_module.db, mongo.db)
+    replace_everywhere(mongo_module.async_db, mongo.async_db)
+    if download is not None:
+        from app.pdf import downloader
+
+        replace_everywhere(downloader.download_bytes, download)
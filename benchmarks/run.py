@@ -0,0 +1,395 @@
+"""
+Offline benchmarks for ingestion throughput and /query latency.
+
+OpenAI and Mongo are replaced by the in-process fakes in benchmarks/fakes.py
+and Qdrant by the local vector store, so runs need no network and no
+credentials, and results only move when our code (or the simulated latency)
+does. `--embedding-backend local` embeds with the in-process CPU encoder
+instead of the simulated API, for large corpora. Results are written as JSON
+for comparing commits:
+
+    python -m benchmarks.run --output before.json
+    git checkout my-branch
+    python -m benchmarks.run --output after.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", default="-", help="JSON results file ('-' for stdout)")
+    parser.add_argument("--documents", type=int, default=50, help="documents per Mongo-backed source")
+    parser.add_argument("--pdf-share", type=float, default=0.5, help="fraction of SOPs that are PDFs")
+    parser.add_argument("--pdf-pages", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="requests per /query endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--embedding-backend",
+        choices=["openai", "local"],
+        default="openai",
+        help="'openai' is faked with --embed-latency-ms per request; 'local' runs the CPU hashing encoder",
+    )
+    parser.add_argument("--embed-latency-ms", type=float, default=30.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0, help="time to the first answer token")
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--answer-cache", action="store_true", help="leave the semantic answer cache on")
+    parser.add_argument("--no-hybrid", action="store_true", help="vector search only")
+    parser.add_argument("--skip-ingest", action="store_true")
+    parser.add_argument("--skip-query", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir):
+    """Settings are read from the environment at import time, so this runs before any app import."""
+    os.environ["VECTOR_STORE"] = "local"
+    os.environ["LOCAL_VECTOR_STORE_PATH"] = os.path.join(workdir, "vectors")
+    # Every run should pay for every embedding and answer
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    os.environ["ANSWER_CACHE_ENABLED"] = "true" if args.answer_cache else "false"
+    os.environ["HYBRID_SEARCH_ENABLED"] = "false" if args.no_hybrid else "true"
+    os.environ["HISTORY_SUMMARY_ENABLED"] = "false"
+    os.environ["EMBEDDING_BACKEND"] = args.embedding_backend
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("MONGO_DB_NAME", "benchmark")
+    os.environ.setdefault("QDRANT_COLLECTION", "benchmark")
+
+
+def summarize(values):
+    """Latency summary in milliseconds."""
+    if not values:
+        return {"count": 0}
+    ms = np.asarray(values, dtype=np.float64) * 1000
+    return {
+        "count": int(ms.size),
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "max": round(float(ms.max()), 3),
+    }
+
+
+def stage_result(seconds, per_document, documents, items):
+    return {
+        "seconds": round(seconds, 4),
+        "documents": documents,
+        "items": items,
+        "documents_per_second": round(documents / seconds, 2) if seconds else None,
+        "items_per_second": round(items / seconds, 2) if seconds else None,
+        "latency_ms": summarize(per_document),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def bench_source(source):
+    """Run one source's documents through each stage in turn, timing every stage separately."""
+    from app.pdf.embedder import get_embeddings
+    from app.pdf.uploader import BatchUploader, upload_to_qdrant
+
+    documents, fetch_seconds = timed(lambda: list(source.fetch(since=None)))
+    stages = {"parse": [], "chunk": [], "embed": [], "upload": []}
+
+    texts = []
+    for doc in documents:
+        text, seconds = timed(source.extract, doc)
+        stages["parse"].append(seconds)
+        if text:
+            texts.append((doc, text))
+
+    chunked = []
+    for doc, text in texts:
+        chunks, seconds = timed(
+            source.chunker, text, chunk_size=source.chunk_size, chunk_overlap=source.chunk_overlap
+        )
+        stages["chunk"].append(seconds)
+        chunked.append((doc, chunks))
+
+    embedded = []
+    for doc, chunks in chunked:
+        embeddings, seconds = timed(get_embeddings, chunks)
+        stages["embed"].append(seconds)
+        embedded.append((doc, list(zip(chunks, embeddings))))
+
+    uploader = BatchUploader()
+    for doc, points in embedded:
+        _, seconds = timed(
+            upload_to_qdrant,
+            chunks=points,
+            meta=doc,
+            collection=source.collection,
+            module_type=source.module_type,
+            uploader=uploader,
+        )
+        stages["upload"].append(seconds)
+    # Buffered points are only written here; charge the flush to the stage
+    _, flush_seconds = timed(uploader.close)
+
+    chunk_count = sum(len(chunks) for _, chunks in chunked)
+    return {
+        "documents": len(documents),
+        "chunks": chunk_count,
+        "fetch_seconds": round(fetch_seconds, 4),
+        "stages": {
+            "parse": stage_result(sum(stages["parse"]), stages["parse"], len(documents), len(texts)),
+            "chunk": stage_result(sum(stages["chunk"]), stages["chunk"], len(texts), chunk_count),
+            "embed": stage_result(sum(stages["embed"]), stages["embed"], len(chunked), chunk_count),
+            "upload": stage_result(
+                sum(stages["upload"]) + flush_seconds, stages["upload"], len(embedded), chunk_count
+            ),
+        },
+    }
+
+
+def bench_ingestion():
+    from app.pipeline.runner import SOURCES, run_pipeline
+
+    results = {"sources": {}}
+    for name, source in SOURCES.items():
+        results["sources"][name] = bench_source(source)
+
+    # The same documents again through the threaded pipeline, where stages overlap
+    summary, seconds = timed(run_pipeline, list(SOURCES), incremental=False)
+    documents = sum(source["documents"] for source in summary.values())
+    results["pipeline"] = {
+        "seconds": round(seconds, 4),
+        "documents": documents,
+        "failed": sum(source["failed"] for source in summary.values()),
+        "documents_per_second": round(documents / seconds, 2) if seconds else None,
+    }
+    return results
+
+
+def parse_server_timing(header):
+    """{stage: milliseconds} from a `Server-Timing` header."""
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                timings[name] = float(value)
+    return timings
+
+
+async def run_load(client, path, payloads, concurrency, streaming, method="POST"):
+    """
+    Send `payloads` from `concurrency` clients at once and summarise the latencies.
+
+    A POST payload is the JSON body; a GET payload is the query string.
+    """
+    latencies, first_tokens, errors = [], [], []
+    stage_seconds = {}
+    pending = deque(payloads)
+
+    def record_stages(timings_ms):
+        for stage, ms in timings_ms.items():
+            stage_seconds.setdefault(stage, []).append(ms / 1000)
+
+    async def one(payload):
+        started = time.perf_counter()
+        if not streaming:
+            if method == "GET":
+                response = await client.get(path, params=payload)
+            else:
+                response = await client.post(path, json=payload)
+            response.raise_for_status()
+            record_stages(parse_server_timing(response.headers.get("server-timing", "")))
+        else:
+            first_token = None
+            event = None
+            async with client.stream("POST", path, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                        if event == "token" and first_token is None:
+                            first_token = time.perf_counter() - started
+                        elif event == "error":
+                            raise RuntimeError("stream reported an error event")
+                    elif event == "done" and line.startswith("data: "):
+                        record_stages(json.loads(line[len("data: "):]).get("timings", {}))
+            if first_token is not None:
+                first_tokens.append(first_token)
+        latencies.append(time.perf_counter() - started)
+
+    async def worker():
+        while pending:
+            payload = pending.popleft()
+            try:
+                await one(payload)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    result = {
+        "requests": len(payloads),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "seconds": round(wall, 4),
+        "requests_per_second": round(len(latencies) / wall, 2) if wall else None,
+        "latency_ms": summarize(latencies),
+    }
+    if streaming:
+        result["first_token_ms"] = summarize(first_tokens)
+    # As reported by the server (Server-Timing, or the `done` event when streaming)
+    result["server_stages_ms"] = {stage: summarize(values) for stage, values in sorted(stage_seconds.items())}
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+@contextlib.contextmanager
+def serve(app):
+    """
+    Serve the API with uvicorn on a free loopback port from a background thread.
+
+    A real server is needed to see when streamed tokens reach the client; an
+    in-process ASGI transport only hands over the response once it is complete.
+
+    Yields:
+        The server's base URL
+    """
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Benchmark server failed to start.")
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        thread.join()
+        sock.close()
+
+
+async def bench_query(args):
+    import httpx
+    from app.api.query import app
+    from benchmarks.corpus import QUESTIONS
+
+    def payloads():
+        # One session per concurrent client, so chat history grows like it does in use
+        return [
+            {
+                "prompt": QUESTIONS[i % len(QUESTIONS)],
+                "top_k": args.top_k,
+                "sessionId": f"benchmark-{i % args.concurrency}",
+                "userId": "benchmark",
+            }
+            for i in range(args.requests)
+        ]
+
+    def session_payloads():
+        return [
+            {"userId": "benchmark", "mode": "full" if i % 2 else "summary", "limit": 10}
+            for i in range(args.requests)
+        ]
+
+    with serve(app) as base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=None, trust_env=False) as client:
+            # Warm up imports, encoders and the vector store memory map
+            await run_load(client, "/query", payloads()[: min(4, args.requests)], 1, streaming=False)
+            return {
+                "query": await run_load(client, "/query", payloads(), args.concurrency, streaming=False),
+                "query_stream": await run_load(
+                    client, "/query/stream", payloads(), args.concurrency, streaming=True
+                ),
+                # Reads back the sessions the query runs above just wrote
+                "sessions": await run_load(
+                    client, "/sessions", session_payloads(), args.concurrency, streaming=False, method="GET"
+                ),
+            }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as workdir:
+        configure_environment(args, workdir)
+
+        # PyMuPDF prints a deprecation notice on import; keep it off the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            from app.api import query  # noqa: F401  imported so install() patches its clients too
+            from app.pipeline import runner  # noqa: F401
+        from benchmarks import corpus, fakes
+
+        behaviour = fakes.FakeOpenAIBehaviour(
+            embed_latency=args.embed_latency_ms / 1000,
+            chat_latency=args.chat_latency_ms / 1000,
+            token_latency=args.token_latency_ms / 1000,
+            answer_tokens=args.answer_tokens,
+        )
+        mongo = fakes.FakeMongo()
+        pdfs = corpus.seed(mongo.db, args.documents, args.pdf_share, args.pdf_pages, args.seed)
+        fakes.install(behaviour, mongo, download=lambda url, *a, **kw: pdfs[url])
+
+        results = {
+            "meta": {
+                "commit": git_commit(),
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "parameters": vars(args),
+            }
+        }
+        # The service prints progress on stdout; keep it off the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            if not args.skip_ingest:
+                results["ingestion"] = bench_ingestion()
+            if not args.skip_query:
+                if args.skip_ingest:
+                    raise SystemExit("--skip-ingest leaves nothing to query; drop it or --skip-query too.")
+                results["query"] = asyncio.run(bench_query(args))
+        results["openai_calls"] = dict(behaviour.calls)
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"📊 Benchmark results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
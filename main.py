@@ -1,40 +1,45 @@
-# from app.pdf.ingest_pdf import process_all_sops,process_pdf_to_qdrant
-from app.pdf.ingest_pdf import process_all_sops
-from app.trainings.ingest_tps import process_all_trainings
-from app.forms.ingest_forms import process_all_forms
-from app.tasks.ingest_tasks import process_all_tasks
-from app.audits.ingest_audits import process_all_audits
-from app.guides.ingest_guide import process_individual_guides
+import json
+import sys
+from app.config import INGEST_SUMMARY_PATH
+from app.pipeline.runner import run_pipeline, SOURCES
+from app.pipeline.telemetry import IngestTelemetry, emit
+from app.pdf.embedder import cache as embedding_cache, scheduler as embedding_scheduler
 
-def main():
-    """Process all document types sequentially"""
-    
-    # Define the processing functions and their names
-    processors = [
-        # ("Trainings", process_all_trainings),
-        # ("Forms", process_all_forms),
-        # ("Tasks", process_all_tasks),
-        # ("Audits", process_all_audits),
-        # ("Guides",process_individual_guides),
-        # ("SOPs", process_all_sops),
-    ]
+def main(source_names=None, incremental=True, summary_path=INGEST_SUMMARY_PATH):
+    """
+    Process document types through the staged ingestion pipeline
+
+    Progress is logged as JSON lines; the end-of-run summary is logged too and,
+    when `summary_path` is set, written there as a JSON document.
+
+    Args:
+        source_names: Sources to ingest (trainings, forms, tasks, audits, guides, sops); all when empty
+        incremental: Only ingest documents changed since the last run
+        summary_path: File to write the summary to
+
+    Returns:
+        The summary: totals and per-module throughput, stage seconds and error counts
+    """
+    names = source_names or list(SOURCES)
     
-    print("🚀 Starting document processing pipeline...")
-    print("=" * 50)
+    telemetry = IngestTelemetry()
+    emit("run_started", sources=names, incremental=incremental)
     
-    for doc_type, processor_func in processors:
-        try:
-            print(f"\n📋 Processing {doc_type}...")
-            print("-" * 30)
-            processor_func()
-            print(f"✅ Completed processing {doc_type}")
-        except Exception as e:
-            print(f"❌ Failed to process {doc_type}: {e}")
-            # Continue with next processor even if one fails
-            continue
+    results = run_pipeline(names, incremental=incremental, telemetry=telemetry)
     
-    print("\n🎉 Document processing pipeline completed!")
-    print("=" * 50)
+    fields = {"sources": results, "incremental": incremental, "embedding_scheduler": embedding_scheduler.stats()}
+    if embedding_cache is not None:
+        fields["embedding_cache"] = embedding_cache.stats()
+    summary = telemetry.finish(**fields)
+
+    if summary_path:
+        with open(summary_path, "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+    return summary
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Usage: python main.py [--full] [source ...]
+    args = sys.argv[1:]
+    summary = main([arg for arg in args if not arg.startswith("--")], incremental="--full" not in args)
+    failed = summary["totals"]["failed"] or any(result["fetch_failed"] for result in summary["sources"].values())
+    sys.exit(1 if failed else 0)
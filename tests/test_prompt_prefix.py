@@ -0,0 +1,103 @@
+"""
+The chat request for /query must start with the same bytes every time, or the
+provider can't reuse its cached prefill. Requests are built through the real
+answer path (history read, context packing, build_messages) and captured as
+the OpenAI SDK serializes them.
+"""
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+for name, value in {
+    "OPENAI_API_KEY": "test",
+    "MONGO_DB_NAME": "test",
+    "QDRANT_COLLECTION": "test",
+    "VECTOR_STORE": "local",
+    "EMBEDDING_BACKEND": "local",
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "ANSWER_CACHE_ENABLED": "false",
+    "HYBRID_SEARCH_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from app.api import query
+from app.api.prompts import SYSTEM_INSTRUCTIONS
+from app.db import mongo as mongo_module
+from benchmarks import fakes
+
+
+def _completion(request):
+    return httpx.Response(200, json={
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "An answer that becomes history."},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    })
+
+
+@pytest.fixture
+def captured_bodies(monkeypatch):
+    bodies = []
+
+    def handler(request):
+        bodies.append(request.content)
+        return _completion(request)
+
+    client = AsyncOpenAI(api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(query, "openai_client", client)
+
+    mongo = fakes.FakeMongo()
+    original = mongo_module.async_db
+    # Modules bind the client at import (`from app.db.mongo import async_db`)
+    for name, module in list(sys.modules.items()):
+        if name.startswith("app.") and getattr(module, "async_db", None) is original:
+            monkeypatch.setattr(module, "async_db", mongo.async_db)
+
+    async def search_chunks(request, query_embedding):
+        # Different context for every prompt, from nothing to several chunks
+        words = request.prompt.split()
+        return [SimpleNamespace(payload={"text": f"{word} " * (10 * i + 1)}) for i, word in enumerate(words[1:])]
+
+    monkeypatch.setattr(query, "search_chunks", search_chunks)
+    return bodies
+
+
+async def _ask(prompts):
+    for session_id, prompt in prompts:
+        await query.answer_query(query.QueryRequest(prompt=prompt, sessionId=session_id))
+    await asyncio.gather(*query._background_tasks)
+
+
+def test_requests_share_the_static_prefix(captured_bodies):
+    asyncio.run(_ask([
+        ("a", "Hi"),
+        ("a", "And who can see the chat settings?"),
+        ("a", "Show me the LTO best practices"),
+        ("b", "How do I set up a morning audit checklist?"),
+    ]))
+
+    assert len(captured_bodies) == 4
+    first = captured_bodies[0]
+    # The static prefix ends with the instructions, however the SDK escapes them
+    encodings = [json.dumps(SYSTEM_INSTRUCTIONS, ensure_ascii=ascii).encode("utf-8") for ascii in (False, True)]
+    instructions = next(encoded for encoded in encodings if encoded in first)
+    prefix = first[: first.index(instructions) + len(instructions)]
+
+    for body in captured_bodies:
+        assert body.startswith(prefix)
+    # The requests really did differ after the prefix: history and context
+    assert len(set(captured_bodies)) == len(captured_bodies)
+    later = json.loads(captured_bodies[2])["messages"][1]["content"]
+    assert "Hi" in later and "LTO" in later